@@ -9,490 +9,817 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
+import logging
+from data import CACHE_DIR, LOAD_REPORT, load_events
+from profiling import phase, write_report
+from query import CUBE_DIMENSIONS, CUBE_MEASURES, FILTER_DIMENSIONS, normalize_selection
+from geo import level_for_zoom
+from timeseries import MAX_POINTS, fill_gaps, lttb
+import dataset
+from functools import lru_cache, wraps
+from concurrent.futures import ThreadPoolExecutor
+from flask import Response, jsonify, request
+import hashlib
+import orjson
+from cache import FigureCache
+import export
+import metrics
+import plotly.io as pio
+import json
+import os
 
+logging.basicConfig(level=logging.INFO)
+# Dash encodes callback responses with plotly's JSON engine
+pio.json.config.default_engine = "orjson"
 _dash_renderer._set_react_version("18.2.0")
 
 # EDA
-df = pd.read_csv("https://raw.githubusercontent.com/jmanali1996/Civilian-Conflicts/main/GEDEvent_v24_1.csv", low_memory=False)
-df = df.astype({"type_of_violence": 'str'})
-df.loc[df['type_of_violence'] == '1', 'type_of_violence'] = "State-based conflict"
-df.loc[df['type_of_violence'] == '2', 'type_of_violence'] = "Non-state conflict"
-df.loc[df['type_of_violence'] == '3', 'type_of_violence'] = "One-sided violence"
-df = df.astype({"active_year": 'str'})
-df.loc[df['active_year'] == '0', 'active_year'] = "Under 25 fatalities"
-df.loc[df['active_year'] == '1', 'active_year'] = "Over 25 fatalities"
-df = df.astype({"where_prec": 'str'})
-df.loc[df['where_prec'] == '1', 'where_prec'] = "Exact location"
-df.loc[df['where_prec'] == '2', 'where_prec'] = "Within 25 km radius"
-df.loc[df['where_prec'] == '3', 'where_prec'] = "Local area"
-df.loc[df['where_prec'] == '4', 'where_prec'] = "Region level"
-df.loc[df['where_prec'] == '5', 'where_prec'] = "Linear feature"
-df.loc[df['where_prec'] == '6', 'where_prec'] = "Country level"
-df.loc[df['where_prec'] == '7', 'where_prec'] = "International waters/airspace"
-df = df.astype({"date_prec": 'str'})
-df.loc[df['date_prec'] == '1', 'date_prec'] = "Exact date"
-df.loc[df['date_prec'] == '2', 'date_prec'] = "2-6 day range"
-df.loc[df['date_prec'] == '3', 'date_prec'] = "Week known"
-df.loc[df['date_prec'] == '4', 'date_prec'] = "Month known"
-df.loc[df['date_prec'] == '5', 'date_prec'] = "Year known"
-dff_cd = df[['year', 'region', 'country', 'conflict_name', 'date_start', 'date_end', 'where_prec', 'date_prec', 'best']].copy()
-dff_cd['date_start'] = pd.to_datetime(dff_cd['date_start'], format='%Y/%m/%d %H:%M:%S')
-dff_cd['date_end'] = pd.to_datetime(dff_cd['date_end'], format='%Y/%m/%d %H:%M:%S')
-dff_cd['conflict_duration'] = dff_cd['date_end'] - dff_cd['date_start']
-dff_cd['conflict_period'] = dff_cd['conflict_duration'].dt.days
-dff_cd = dff_cd.sort_values(['conflict_period', 'best'], ascending=[False, False])
+# events plus everything derived from them (dff_cd, cube, indexes) live in one
+# dataset.Dataset that candidate batches replace atomically; read it through
+# dataset.current() once per callback
+dataset.init(load_events(), LOAD_REPORT['sha256'][:16])
+CD_COLUMNS = ['year', 'region', 'country', 'conflict_name', 'conflict_period', 'best', 'where_prec', 'date_prec']
+
+def select_cells(selected_year, selected_region, selected_country, selected_violence, ds=None):
+    ds = ds or dataset.current()
+    with metrics.timed("filter"):
+        return ds.selections.get(normalize_selection(selected_year, selected_region, selected_country, selected_violence))
+
+figure_cache = FigureCache(
+    max_bytes=int(os.environ.get("GED_FIGURE_CACHE_MB", 64)) * 2**20,
+    ttl=int(os.environ.get("GED_FIGURE_CACHE_TTL", 600))
+)
+
+# bounded pool shared by all requests of this worker for building figures in parallel
+figure_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("GED_FIGURE_THREADS", 3)), thread_name_prefix="figure")
+
+def cached_figure(figure_id):
+    # wraps a chart callback so repeated selections reuse the serialized figure
+    def decorate(build):
+        @wraps(build)
+        def wrapper(n_clicks, *selection, ds=None):
+            # callers building several figures for one request pass the version they pinned
+            ds = ds or dataset.current()
+            key = (figure_id, normalize_selection(*selection), ds.version)
+            with metrics.callback(build.__name__):
+                return figure_cache.get_or_build(key, metrics.timed("figure")(lambda: build(n_clicks, *selection, ds=ds)))
+        return wrapper
+    return decorate
+
+@metrics.timed("groupby")
+def cell_totals(cells):
+    return {
+        'years': cells['year'].nunique(),
+        'regions': cells['region'].nunique(),
+        'countries': cells['country'].nunique(),
+        'conflicts': cells['conflicts'].sum(),
+        'fatalities': cells['best'].sum()
+    }
+
+@metrics.timed("groupby")
+def violence_totals(cells):
+    return cells.groupby('type_of_violence', observed=True)['best'].sum().reset_index()
+
+@metrics.timed("groupby")
+def threshold_totals(cells):
+    return cells.groupby(['active_year', 'region'], observed=True)['best'].sum().reset_index()
+
+@metrics.timed("groupby")
+def region_country_totals(cells):
+    return cells.groupby(['region', 'country'], observed=True).agg(
+        conflicts=pd.NamedAgg(column='conflicts', aggfunc='sum'),
+        side_a_fatalities=pd.NamedAgg(column='deaths_a', aggfunc='sum'),
+        side_b_fatalities=pd.NamedAgg(column='deaths_b', aggfunc='sum'),
+        civilians_fatalities=pd.NamedAgg(column='deaths_civilians', aggfunc='sum'),
+        unknown_fatalities=pd.NamedAgg(column='deaths_unknown', aggfunc='sum'),
+        total_fatalities=pd.NamedAgg(column='best', aggfunc='sum')
+        ).reset_index()
 
 app = dash.Dash(__name__, suppress_callback_exceptions=True)
+server = app.server
+metrics.install(app)
+
+# CACHE COUNTERS
+@app.server.route('/cache-stats')
+def cache_stats():
+    ds = dataset.current()
+    return jsonify({
+        'dataset_version': ds.version,
+        'batches': [stamp[0] for stamp in ds.batches],
+        'figures': figure_cache.stats(),
+        'selections': ds.selections.stats()
+    })
+
+# AGGREGATE API
+# GET /api/aggregate?year=2010&region=Asia&group_by=year,country&measures=best,deaths_civilians
+# selections repeat their parameter (country names may hold commas); group_by and
+# measures take lists. Answers are columnar JSON with an ETag of the dataset
+# version and query, so a poll with If-None-Match gets a 304 before any work
+API_MEASURES = ['conflicts'] + CUBE_MEASURES
+
+def api_list(name):
+    return [v for value in request.args.getlist(name) for v in value.split(',') if v]
+
+def api_selection():
+    return normalize_selection(
+        [int(y) for y in request.args.getlist('year')],
+        request.args.getlist('region'),
+        request.args.getlist('country'),
+        request.args.getlist('type_of_violence')
+    )
+
+@app.server.route('/api/aggregate')
+def api_aggregate():
+    try:
+        selection = api_selection()
+    except ValueError:
+        return jsonify({'error': 'year must be an integer'}), 400
+    group_by = api_list('group_by')
+    measures = api_list('measures') or ['best']
+    unknown = [g for g in group_by if g not in CUBE_DIMENSIONS] + [m for m in measures if m not in API_MEASURES]
+    repeated = [v for names in (group_by, measures) for i, v in enumerate(names) if v in names[:i]]
+    if unknown or repeated:
+        return jsonify({
+            'error': 'unknown or repeated group_by/measures: %s' % ', '.join(unknown + repeated),
+            'group_by': CUBE_DIMENSIONS,
+            'measures': API_MEASURES
+        }), 400
+    ds = dataset.current()
+    query = (selection, tuple(group_by), tuple(measures))
+    etag = hashlib.sha256(repr((ds.version,) + query).encode()).hexdigest()[:32]
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        key = ('api-aggregate', query, ds.version)
+        payload = figure_cache.get(key)
+        if payload is None:
+            with metrics.timed("aggregate"):
+                cells = select_cells(*selection, ds=ds).subset
+                if group_by:
+                    totals = cells.groupby(group_by, observed=True)[measures].sum().reset_index()
+                else:
+                    totals = cells[measures].sum().to_frame().T
+            payload = orjson.dumps({
+                'dataset_version': ds.version,
+                'group_by': group_by,
+                'measures': measures,
+                'rows': len(totals),
+                'data': {col: totals[col].tolist() for col in totals.columns}
+            })
+            figure_cache.put(key, payload)
+        response = Response(payload, mimetype='application/json')
+    response.set_etag(etag)
+    # may be stored, but must be revalidated with the ETag before reuse
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# EVENT EXPORT
+# GET /api/export?format=csv|parquet plus the aggregate API's selection parameters;
+# the filtered events are streamed chunk by chunk, never held as one copy
+@app.server.route('/api/export')
+def api_export():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        return jsonify({'error': 'format must be one of: %s' % ', '.join(export.FORMATS)}), 400
+    try:
+        selection = api_selection()
+    except ValueError:
+        return jsonify({'error': 'year must be an integer'}), 400
+    ds = dataset.current()
+    with metrics.timed("filter"):
+        rows = ds.event_index.select(dict(zip(FILTER_DIMENSIONS, selection)))
+    chunks = export.csv_chunks(ds.events, rows) if fmt == 'csv' else export.parquet_chunks(ds.events, rows)
+    mimetype, extension = export.FORMATS[fmt]
+    return Response(chunks, mimetype=mimetype, headers={
+        'Content-Disposition': 'attachment; filename="ged-events-%s.%s"' % (ds.version, extension)
+    })
+
+@metrics.collector
+def cache_metrics():
+    figures = figure_cache.stats()
+    selections = dataset.current().selections.stats()
+    return [
+        ('ged_figure_cache_hits_total', 'counter', 'Figure cache hits.', figures['hits']),
+        ('ged_figure_cache_misses_total', 'counter', 'Figure cache misses.', figures['misses']),
+        ('ged_figure_cache_evictions_total', 'counter', 'Figures evicted to stay under the byte bound.', figures['evictions']),
+        ('ged_figure_cache_expirations_total', 'counter', 'Figures dropped after their TTL.', figures['expirations']),
+        ('ged_figure_cache_bytes', 'gauge', 'Bytes of serialized figures held.', figures['bytes']),
+        ('ged_figure_cache_entries', 'gauge', 'Serialized figures held.', figures['entries']),
+        ('ged_selection_cache_hits_total', 'counter', 'Selection cache hits of the current dataset version.', selections['hits']),
+        ('ged_selection_cache_misses_total', 'counter', 'Selection cache misses of the current dataset version.', selections['misses']),
+        ('ged_selection_cache_entries', 'gauge', 'Selections held.', selections['entries'])
+    ]
+
+# DROPDOWN OPTIONS SHARED BY ALL PAGES
+def dropdown_options():
+    return dataset.current().dropdown_options
 
 # WORLDWIDE CONFLICTS AND FATALITIES PAGE 
-wcf_layout = dmc.MantineProvider(
-    children=[
-        dmc.Title("Shattered Lives", order=1, style={'textAlign': 'center', 'color': 'red'}),
-        #menu and page title
-        html.Div([
+# keyed by dataset version so new candidate events reach the dropdowns
+@lru_cache(maxsize=2)
+@phase("layout_wcf")
+def wcf_layout(version):
+    return dmc.MantineProvider(
+        children=[
+            dmc.Title("Shattered Lives", order=1, style={'textAlign': 'center', 'color': 'red'}),
+            #menu and page title
             html.Div([
-                dmc.Menu([
-                    dmc.MenuTarget(dmc.Burger()),
-                    dmc.MenuDropdown([
-                        dmc.MenuItem(dcc.Link("Worldwide Conflicts and Fatalities", href="/worldwide-conflicts-and-fatalities")),
-                        dmc.MenuItem(dcc.Link("Fatalities Causation", href="/fatalities-causation")),
-                        dmc.MenuItem(dcc.Link("Fatalities Distribution", href="/fatalities-distribution")),
-                        dmc.MenuItem(dcc.Link("Conflicts Details", href="/conflicts-details"))
+                html.Div([
+                    dmc.Menu([
+                        dmc.MenuTarget(dmc.Burger()),
+                        dmc.MenuDropdown([
+                            dmc.MenuItem(dcc.Link("Worldwide Conflicts and Fatalities", href="/worldwide-conflicts-and-fatalities")),
+                            dmc.MenuItem(dcc.Link("Fatalities Causation", href="/fatalities-causation")),
+                            dmc.MenuItem(dcc.Link("Fatalities Distribution", href="/fatalities-distribution")),
+                            dmc.MenuItem(dcc.Link("Fatalities Over Time", href="/fatalities-over-time")),
+                            dmc.MenuItem(dcc.Link("Conflicts Details", href="/conflicts-details")),
+                            dmc.MenuItem(dcc.Link("Conflicts Map", href="/conflicts-map"))
+                        ])
                     ])
-                ])
-            ], style={'display': 'inline-block', 'marginLeft': 10}),
+                ], style={'display': 'inline-block', 'marginLeft': 10}),
+                html.Div([
+                    dmc.Text("Worldwide Conflicts and Fatalities", size="xl", fw=700)
+                ], style={'display': 'inline-block', 'marginLeft': 5})
+            ], style={'display': 'flex', 'alignItems': 'center'}),
+            #dropdowns
             html.Div([
-                dmc.Text("Worldwide Conflicts and Fatalities", size="xl", fw=700)
-            ], style={'display': 'inline-block', 'marginLeft': 5})
-        ], style={'display': 'flex', 'alignItems': 'center'}),
-        #dropdowns
-        html.Div([
+                html.Div([
+                    html.Label(children=['Year:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                    dcc.Dropdown(
+                        id='year-variable',
+                        options=dropdown_options()['year'],
+                        value=None,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Select a year",
+                        style={'color': 'black', 'width': 276, 'height': 40}
+                    )
+                ], style={'display': 'inline-block', 'marginLeft': 10, 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    html.Label(children=['Region:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                    dcc.Dropdown(
+                        id='region-variable',
+                        options=dropdown_options()['region'],
+                        value=None,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Select a region",
+                        style={'color': 'black', 'width': 276, 'height': 40}
+                    )
+                ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    html.Label(children=['Country:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                    dcc.Dropdown(
+                        id='country-variable',
+                        options=dropdown_options()['country'],
+                        value=None,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Select a country",
+                        style={'color': 'black', 'width': 276, 'height': 40}
+                    )
+                ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    html.Label(children=['Type of violence:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                    html.Div(
+                        children=dmc.Popover(
+                            [
+                                dmc.PopoverTarget(
+                                    dmc.ActionIcon(
+                                        DashIconify(icon="dashicons:info"),
+                                        size="xs"
+                                    )
+                                ),
+                                dmc.PopoverDropdown(
+                                    children=[
+                                        dmc.Text(
+                                            children=[
+                                                html.B("Non-state conflict"), " is armed force between two organized groups, neither of "
+                                                "which is a state government, resulting in at least 25 battle-related deaths in a year."
+                                            ],
+                                        size="sm"
+                                        ),
+                                        dmc.Text(
+                                            children=[
+                                                html.B("One-sided violence"), " is the use of armed force by a government or organized group "
+                                                "against civilians, resulting in at least 25 deaths, excluding extrajudicial killings in custody."
+                                            ],
+                                            size="sm"
+                                        ),
+                                        dmc.Text(
+                                            children=[
+                                                html.B("State-based armed conflict"), " involves a dispute over government or territory, "
+                                                "where armed force between at least one government and another party results in "
+                                                "at least 25 battle-related deaths in a year."
+                                            ],
+                                            size="sm"
+                                        ),
+                                        dmc.Text(
+                                            "source: Uppsala Conflict Data Program (UCDP)",
+                                            size="sm",
+                                            c="gray"
+                                        )
+                                    ] 
+                                )
+                            ],
+                            width=400,
+                            position="bottom",
+                            withArrow=True,
+                            shadow="md",
+                            zIndex=2000
+                        ),
+                        style={'position': 'absolute', 'top': 5, 'left': 258, 'zIndex': 1}
+                    ),
+                    dcc.Dropdown(
+                        id='violence-variable',
+                        options=dropdown_options()['type_of_violence'],
+                        value=None,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Select a type of violence",
+                        style={'color': 'black', 'width': 276, 'height': 40}
+                    )
+                ], style={'position': 'relative', 'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    dmc.Button(
+                        id="submit-btn-wcf",
+                        children="Submit",
+                        size="md",
+                        color="black",
+                        style={'font-weight': 'bold', 'font-size': 15, 'width': 276, 'height': 40}
+                    )
+                ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'bottom'}),
+                html.Div([
+                    dmc.Menu([
+                        dmc.MenuTarget(
+                            dmc.ActionIcon(
+                                DashIconify(icon="material-symbols:download", width=24),
+                                size=40,
+                                variant="outline",
+                                color="black"
+                            )
+                        ),
+                        dmc.MenuDropdown([
+                            dmc.MenuLabel("Export selected events"),
+                            dmc.MenuItem("CSV", id='export-csv-wcf', href="/api/export?format=csv", refresh=True),
+                            dmc.MenuItem("Parquet", id='export-parquet-wcf', href="/api/export?format=parquet", refresh=True)
+                        ])
+                    ])
+                ], style={'display': 'inline-block', 'marginBottom': 10, 'verticalAlign': 'bottom'})
+            ]), 
+            #cards
             html.Div([
-                html.Label(children=['Year:'], style={'color': 'black', 'fontWeight': 'bold'}),
-                dcc.Dropdown(
-                    id='year-variable',
-                    options=[{'label':y,'value':y} for y in sorted(df['year'].unique())],
-                    value=None,
-                    multi=True,
-                    searchable=True,
-                    placeholder="Select a year",
-                    style={'color': 'black', 'width': 276, 'height': 40}
-                )
-            ], style={'display': 'inline-block', 'marginLeft': 10, 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    dmc.Card(
+                        id='selected-year-card',
+                        shadow="sm",
+                        withBorder=True,
+                        style={'backgroundColor': '#bebebe', 'color': '#b7091d', 'fontWeight': 'bold'}
+                    )
+                ], style={'display': 'inline-block', 'marginLeft': 10, 'marginRight': 10, 'marginBottom': 10, 'width': 276, 'textAlign': 'center', 'fontSize': 20}),
+                html.Div([
+                    dmc.Card(
+                        id='selected-region-card',
+                        shadow="sm",
+                        withBorder=True,
+                        style={'backgroundColor': '#bebebe', 'color': '#b7091d', 'fontWeight': 'bold'}
+                    )
+                ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'width': 276, 'textAlign': 'center', 'fontSize': 20}),
+                html.Div([
+                    dmc.Card(
+                        id='selected-country-card',
+                        shadow="sm",
+                        withBorder=True,
+                        style={'backgroundColor': '#bebebe', 'color': '#b7091d', 'fontWeight': 'bold'}
+                    )
+                ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'width': 276, 'textAlign': 'center', 'fontSize': 20}),
+                html.Div([
+                    dmc.Card(
+                        id='conflict-count-card',
+                        shadow="sm",
+                        withBorder=True,
+                        style={'backgroundColor': '#bebebe', 'color': '#b7091d', 'fontWeight': 'bold'}
+                    )
+                ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'width': 276, 'textAlign': 'center', 'fontSize': 20}),
+                html.Div([
+                    dmc.Card(
+                        id='fatality-sum-card',
+                        shadow="sm",
+                        withBorder=True,
+                        style={'backgroundColor': '#bebebe', 'color': '#b7091d', 'fontWeight': 'bold'}
+                    )
+                ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'width': 276, 'textAlign': 'center', 'fontSize': 20})
+            ]),
+            #treemap graph
             html.Div([
-                html.Label(children=['Region:'], style={'color': 'black', 'fontWeight': 'bold'}),
-                dcc.Dropdown(
-                    id='region-variable',
-                    options=[{'label':r,'value':r} for r in sorted(df['region'].unique())],
-                    value=None,
-                    multi=True,
-                    searchable=True,
-                    placeholder="Select a region",
-                    style={'color': 'black', 'width': 276, 'height': 40}
-                )
-            ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                dcc.Graph(id='wcf-chart')
+            ], style={'marginLeft': 10, 'marginRight': 10, 'width': 1420})
+        ]
+    )
+
+# FATALITIES CAUSATION PAGE
+# keyed by dataset version so new candidate events reach the dropdowns
+@lru_cache(maxsize=2)
+@phase("layout_fo")
+def fo_layout(version):
+    return dmc.MantineProvider(
+        children=[
+            dmc.Title("Shattered Lives", order=1, style={'textAlign': 'center', 'color': 'red'}),
+            #menu and page title
             html.Div([
-                html.Label(children=['Country:'], style={'color': 'black', 'fontWeight': 'bold'}),
-                dcc.Dropdown(
-                    id='country-variable',
-                    options=[{'label':c,'value':c} for c in sorted(df['country'].unique())],
-                    value=None,
-                    multi=True,
-                    searchable=True,
-                    placeholder="Select a country",
-                    style={'color': 'black', 'width': 276, 'height': 40}
-                )
-            ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    dmc.Menu([
+                        dmc.MenuTarget(dmc.Burger()),
+                        dmc.MenuDropdown([
+                            dmc.MenuItem(dcc.Link("Worldwide Conflicts and Fatalities", href="/worldwide-conflicts-and-fatalities")),
+                            dmc.MenuItem(dcc.Link("Fatalities Causation", href="/fatalities-causation")),
+                            dmc.MenuItem(dcc.Link("Fatalities Distribution", href="/fatalities-distribution")),
+                            dmc.MenuItem(dcc.Link("Fatalities Over Time", href="/fatalities-over-time")),
+                            dmc.MenuItem(dcc.Link("Conflicts Details", href="/conflicts-details")),
+                            dmc.MenuItem(dcc.Link("Conflicts Map", href="/conflicts-map"))
+                        ])
+                    ])
+                ], style={'display': 'inline-block', 'marginLeft': 10}),
+                html.Div([
+                    dmc.Text("Fatalities Causation", size="xl", fw=700)
+                ], style={'display': 'inline-block', 'marginLeft': 5})
+            ], style={'display': 'flex', 'alignItems': 'center'}),
+            #dropdowns
             html.Div([
-                html.Label(children=['Type of violence:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                html.Div([
+                    html.Label(children=['Year:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                    dcc.Dropdown(
+                        id='year-variable',
+                        options=dropdown_options()['year'],
+                        value=None,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Select a year",
+                        style={'color': 'black', 'width': 276, 'height': 40}
+                    )
+                ], style={'display': 'inline-block', 'marginLeft': 10, 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    html.Label(children=['Region:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                    dcc.Dropdown(
+                        id='region-variable',
+                        options=dropdown_options()['region'],
+                        value=None,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Select a region",
+                        style={'color': 'black', 'width': 276, 'height': 40}
+                    )
+                ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    html.Label(children=['Country:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                    dcc.Dropdown(
+                        id='country-variable',
+                        options=dropdown_options()['country'],
+                        value=None,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Select a country",
+                        style={'color': 'black', 'width': 276, 'height': 40}
+                    )
+                ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    html.Label(children=['Type of violence:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                    html.Div(
+                        children=dmc.Popover(
+                            [
+                                dmc.PopoverTarget(
+                                    dmc.ActionIcon(
+                                        DashIconify(icon="dashicons:info"),
+                                        size="xs"
+                                    )
+                                ),
+                                dmc.PopoverDropdown(
+                                    children=[
+                                        dmc.Text(
+                                            children=[
+                                                html.B("Non-state conflict"), " is armed force between two organized groups, neither of "
+                                                "which is a state government, resulting in at least 25 battle-related deaths in a year."
+                                            ],
+                                        size="sm"
+                                        ),
+                                        dmc.Text(
+                                            children=[
+                                                html.B("One-sided violence"), " is the use of armed force by a government or organized group "
+                                                "against civilians, resulting in at least 25 deaths, excluding extrajudicial killings in custody."
+                                            ],
+                                            size="sm"
+                                        ),
+                                        dmc.Text(
+                                            children=[
+                                                html.B("State-based armed conflict"), " involves a dispute over government or territory, "
+                                                "where armed force between at least one government and another party results in "
+                                                "at least 25 battle-related deaths in a year."
+                                            ],
+                                            size="sm"
+                                        ),
+                                        dmc.Text(
+                                            "source: Uppsala Conflict Data Program (UCDP)",
+                                            size="sm",
+                                            c="gray"
+                                        )
+                                    ] 
+                                )
+                            ],
+                            width=400,
+                            position="bottom",
+                            withArrow=True,
+                            shadow="md",
+                            zIndex=2000
+                        ),
+                        style={'position': 'absolute', 'top': 5, 'left': 258, 'zIndex': 1}
+                    ),
+                    dcc.Dropdown(
+                        id='violence-variable',
+                        options=dropdown_options()['type_of_violence'],
+                        value=None,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Select a type of violence",
+                        style={'color': 'black', 'width': 276, 'height': 40}
+                    )
+                ], style={'position': 'relative', 'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    dmc.Button(
+                        id="submit-btn-fo",
+                        children="Submit",
+                        size="md",
+                        color="black",
+                        style={'font-weight': 'bold', 'font-size': 15, 'width': 276, 'height': 40}
+                    )
+                ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'bottom'}),
+                html.Div([
+                    dmc.Menu([
+                        dmc.MenuTarget(
+                            dmc.ActionIcon(
+                                DashIconify(icon="material-symbols:download", width=24),
+                                size=40,
+                                variant="outline",
+                                color="black"
+                            )
+                        ),
+                        dmc.MenuDropdown([
+                            dmc.MenuLabel("Export selected events"),
+                            dmc.MenuItem("CSV", id='export-csv-fo', href="/api/export?format=csv", refresh=True),
+                            dmc.MenuItem("Parquet", id='export-parquet-fo', href="/api/export?format=parquet", refresh=True)
+                        ])
+                    ])
+                ], style={'display': 'inline-block', 'marginBottom': 10, 'verticalAlign': 'bottom'})
+            ]),
+            #pie and bar graphs
+            html.Div([
+                html.Div([
+                    dcc.Graph(id='tov-chart')
+                ], style={'display': 'inline-block', 'marginLeft': 10, 'marginRight': 20, 'width': 700, 'height': 450}),
+                html.Div([
+                    dcc.Graph(id='fc-chart')
+                ], style={'display': 'inline-block', 'marginRight': 10, 'width': 700, 'height': 450})
+            ]),
+            #donut graphs
+            html.Div([
+                dcc.Graph(id='ft-chart'),
                 html.Div(
                     children=dmc.Popover(
                         [
                             dmc.PopoverTarget(
                                 dmc.ActionIcon(
-                                    DashIconify(icon="dashicons:info"),
-                                    size="xs"
+                                    DashIconify(icon="streamline:information-desk-solid", width=30),
+                                    size="lg"
                                 )
                             ),
                             dmc.PopoverDropdown(
                                 children=[
                                     dmc.Text(
-                                        children=[
-                                            html.B("Non-state conflict"), " is armed force between two organized groups, neither of "
-                                            "which is a state government, resulting in at least 25 battle-related deaths in a year."
-                                        ],
-                                    size="sm"
-                                    ),
-                                    dmc.Text(
-                                        children=[
-                                            html.B("One-sided violence"), " is the use of armed force by a government or organized group "
-                                            "against civilians, resulting in at least 25 deaths, excluding extrajudicial killings in custody."
-                                        ],
-                                        size="sm"
-                                    ),
-                                    dmc.Text(
-                                        children=[
-                                            html.B("State-based armed conflict"), " involves a dispute over government or territory, "
-                                            "where armed force between at least one government and another party results in "
-                                            "at least 25 battle-related deaths in a year."
-                                        ],
-                                        size="sm"
+                                        "If a party killing unarmed civilians crosses the 25-death threshold in a year, all its events, "
+                                        "even those in years below the threshold, are included."
                                     ),
                                     dmc.Text(
                                         "source: Uppsala Conflict Data Program (UCDP)",
-                                        size="sm",
                                         c="gray"
                                     )
                                 ] 
                             )
                         ],
-                        width=400,
+                        width=200,
                         position="bottom",
                         withArrow=True,
                         shadow="md",
                         zIndex=2000
                     ),
-                    style={'position': 'absolute', 'top': 5, 'left': 258, 'zIndex': 1}
-                ),
-                dcc.Dropdown(
-                    id='violence-variable',
-                    options=[{'label':v,'value':v} for v in sorted(df['type_of_violence'].unique())],
-                    value=None,
-                    multi=True,
-                    searchable=True,
-                    placeholder="Select a type of violence",
-                    style={'color': 'black', 'width': 276, 'height': 40}
-                )
-            ], style={'position': 'relative', 'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
-            html.Div([
-                dmc.Button(
-                    id="submit-btn-wcf",
-                    children="Submit",
-                    size="md",
-                    color="black",
-                    style={'font-weight': 'bold', 'font-size': 15, 'width': 276, 'height': 40}
-                )
-            ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'bottom'})
-        ]), 
-        #cards
-        html.Div([
-            html.Div([
-                dmc.Card(
-                    id='selected-year-card',
-                    shadow="sm",
-                    withBorder=True,
-                    style={'backgroundColor': '#bebebe', 'color': '#b7091d', 'fontWeight': 'bold'}
-                )
-            ], style={'display': 'inline-block', 'marginLeft': 10, 'marginRight': 10, 'marginBottom': 10, 'width': 276, 'textAlign': 'center', 'fontSize': 20}),
-            html.Div([
-                dmc.Card(
-                    id='selected-region-card',
-                    shadow="sm",
-                    withBorder=True,
-                    style={'backgroundColor': '#bebebe', 'color': '#b7091d', 'fontWeight': 'bold'}
+                    style={'position': 'absolute', 'top': 25, 'left': 1380, 'zIndex': 1}
                 )
-            ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'width': 276, 'textAlign': 'center', 'fontSize': 20}),
-            html.Div([
-                dmc.Card(
-                    id='selected-country-card',
-                    shadow="sm",
-                    withBorder=True,
-                    style={'backgroundColor': '#bebebe', 'color': '#b7091d', 'fontWeight': 'bold'}
-                )
-            ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'width': 276, 'textAlign': 'center', 'fontSize': 20}),
-            html.Div([
-                dmc.Card(
-                    id='conflict-count-card',
-                    shadow="sm",
-                    withBorder=True,
-                    style={'backgroundColor': '#bebebe', 'color': '#b7091d', 'fontWeight': 'bold'}
-                )
-            ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'width': 276, 'textAlign': 'center', 'fontSize': 20}),
-            html.Div([
-                dmc.Card(
-                    id='fatality-sum-card',
-                    shadow="sm",
-                    withBorder=True,
-                    style={'backgroundColor': '#bebebe', 'color': '#b7091d', 'fontWeight': 'bold'}
-                )
-            ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'width': 276, 'textAlign': 'center', 'fontSize': 20})
-        ]),
-        #treemap graph
-        html.Div([
-            dcc.Graph(id='wcf-chart')
-        ], style={'marginLeft': 10, 'marginRight': 10, 'width': 1420})
-    ]
-)
+            ], style={'position': 'relative', 'marginLeft': 10, 'marginRight': 10, 'width': 1420, 'height': 450}) 
+        ]
+    )
 
-# FATALITIES CAUSATION PAGE
-fo_layout = dmc.MantineProvider(
-    children=[
-        dmc.Title("Shattered Lives", order=1, style={'textAlign': 'center', 'color': 'red'}),
-        #menu and page title
-        html.Div([
+# FATALITIES DISTRIBUTION PAGE
+# keyed by dataset version so new candidate events reach the dropdowns
+@lru_cache(maxsize=2)
+@phase("layout_fd")
+def fd_layout(version):
+    return dmc.MantineProvider(
+        children=[
+            dmc.Title("Shattered Lives", order=1, style={'textAlign': 'center', 'color': 'red'}),
+            #menu and page title
             html.Div([
-                dmc.Menu([
-                    dmc.MenuTarget(dmc.Burger()),
-                    dmc.MenuDropdown([
-                        dmc.MenuItem(dcc.Link("Worldwide Conflicts and Fatalities", href="/worldwide-conflicts-and-fatalities")),
-                        dmc.MenuItem(dcc.Link("Fatalities Causation", href="/fatalities-causation")),
-                        dmc.MenuItem(dcc.Link("Fatalities Distribution", href="/fatalities-distribution")),
-                        dmc.MenuItem(dcc.Link("Conflicts Details", href="/conflicts-details"))
+                html.Div([
+                    dmc.Menu([
+                        dmc.MenuTarget(dmc.Burger()),
+                        dmc.MenuDropdown([
+                            dmc.MenuItem(dcc.Link("Worldwide Conflicts and Fatalities", href="/worldwide-conflicts-and-fatalities")),
+                            dmc.MenuItem(dcc.Link("Fatalities Causation", href="/fatalities-causation")),
+                            dmc.MenuItem(dcc.Link("Fatalities Distribution", href="/fatalities-distribution")),
+                            dmc.MenuItem(dcc.Link("Fatalities Over Time", href="/fatalities-over-time")),
+                            dmc.MenuItem(dcc.Link("Conflicts Details", href="/conflicts-details")),
+                            dmc.MenuItem(dcc.Link("Conflicts Map", href="/conflicts-map"))
+                        ])
                     ])
-                ])
-            ], style={'display': 'inline-block', 'marginLeft': 10}),
+                ], style={'display': 'inline-block', 'marginLeft': 10}),
+                html.Div([
+                    dmc.Text("Fatalities Distribution", size="xl", fw=700)
+                ], style={'display': 'inline-block', 'marginLeft': 5})
+            ], style={'display': 'flex', 'alignItems': 'center'}),
+            #dropdowns
             html.Div([
-                dmc.Text("Fatalities Causation", size="xl", fw=700)
-            ], style={'display': 'inline-block', 'marginLeft': 5})
-        ], style={'display': 'flex', 'alignItems': 'center'}),
-        #dropdowns
-        html.Div([
-            html.Div([
-                html.Label(children=['Year:'], style={'color': 'black', 'fontWeight': 'bold'}),
-                dcc.Dropdown(
-                    id='year-variable',
-                    options=[{'label':y,'value':y} for y in sorted(df['year'].unique())],
-                    value=None,
-                    multi=True,
-                    searchable=True,
-                    placeholder="Select a year",
-                    style={'color': 'black', 'width': 276, 'height': 40}
-                )
-            ], style={'display': 'inline-block', 'marginLeft': 10, 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
-            html.Div([
-                html.Label(children=['Region:'], style={'color': 'black', 'fontWeight': 'bold'}),
-                dcc.Dropdown(
-                    id='region-variable',
-                    options=[{'label':r,'value':r} for r in sorted(df['region'].unique())],
-                    value=None,
-                    multi=True,
-                    searchable=True,
-                    placeholder="Select a region",
-                    style={'color': 'black', 'width': 276, 'height': 40}
-                )
-            ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
-            html.Div([
-                html.Label(children=['Country:'], style={'color': 'black', 'fontWeight': 'bold'}),
-                dcc.Dropdown(
-                    id='country-variable',
-                    options=[{'label':c,'value':c} for c in sorted(df['country'].unique())],
-                    value=None,
-                    multi=True,
-                    searchable=True,
-                    placeholder="Select a country",
-                    style={'color': 'black', 'width': 276, 'height': 40}
-                )
-            ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    html.Label(children=['Year:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                    dcc.Dropdown(
+                        id='year-variable',
+                        options=dropdown_options()['year'],
+                        value=None,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Select a year",
+                        style={'color': 'black', 'width': 276, 'height': 40}
+                    )
+                ], style={'display': 'inline-block', 'marginLeft': 10, 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    html.Label(children=['Region:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                    dcc.Dropdown(
+                        id='region-variable',
+                        options=dropdown_options()['region'],
+                        value=None,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Select a region",
+                        style={'color': 'black', 'width': 276, 'height': 40}
+                    )
+                ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    html.Label(children=['Country:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                    dcc.Dropdown(
+                        id='country-variable',
+                        options=dropdown_options()['country'],
+                        value=None,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Select a country",
+                        style={'color': 'black', 'width': 276, 'height': 40}
+                    )
+                ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    html.Label(children=['Type of violence:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                    html.Div(
+                        children=dmc.Popover(
+                            [
+                                dmc.PopoverTarget(
+                                    dmc.ActionIcon(
+                                        DashIconify(icon="dashicons:info"),
+                                        size="xs"
+                                    )
+                                ),
+                                dmc.PopoverDropdown(
+                                    children=[
+                                        dmc.Text(
+                                            children=[
+                                                html.B("Non-state conflict"), " is armed force between two organized groups, neither of "
+                                                "which is a state government, resulting in at least 25 battle-related deaths in a year."
+                                            ],
+                                        size="sm"
+                                        ),
+                                        dmc.Text(
+                                            children=[
+                                                html.B("One-sided violence"), " is the use of armed force by a government or organized group "
+                                                "against civilians, resulting in at least 25 deaths, excluding extrajudicial killings in custody."
+                                            ],
+                                            size="sm"
+                                        ),
+                                        dmc.Text(
+                                            children=[
+                                                html.B("State-based armed conflict"), " involves a dispute over government or territory, "
+                                                "where armed force between at least one government and another party results in "
+                                                "at least 25 battle-related deaths in a year."
+                                            ],
+                                            size="sm"
+                                        ),
+                                        dmc.Text(
+                                            "source: Uppsala Conflict Data Program (UCDP)",
+                                            size="sm",
+                                            c="gray"
+                                        )
+                                    ] 
+                                )
+                            ],
+                            width=400,
+                            position="bottom",
+                            withArrow=True,
+                            shadow="md",
+                            zIndex=2000
+                        ),
+                        style={'position': 'absolute', 'top': 5, 'left': 258, 'zIndex': 1}
+                    ),
+                    dcc.Dropdown(
+                        id='violence-variable',
+                        options=dropdown_options()['type_of_violence'],
+                        value=None,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Select a type of violence",
+                        style={'color': 'black', 'width': 276, 'height': 40}
+                    )
+                ], style={'position': 'relative', 'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    dmc.Button(
+                        id="submit-btn-fd",
+                        children="Submit",
+                        size="md",
+                        color="black",
+                        style={'font-weight': 'bold', 'font-size': 15, 'width': 276, 'height': 40}
+                    )
+                ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'bottom'}),
+                html.Div([
+                    dmc.Menu([
+                        dmc.MenuTarget(
+                            dmc.ActionIcon(
+                                DashIconify(icon="material-symbols:download", width=24),
+                                size=40,
+                                variant="outline",
+                                color="black"
+                            )
+                        ),
+                        dmc.MenuDropdown([
+                            dmc.MenuLabel("Export selected events"),
+                            dmc.MenuItem("CSV", id='export-csv-fd', href="/api/export?format=csv", refresh=True),
+                            dmc.MenuItem("Parquet", id='export-parquet-fd', href="/api/export?format=parquet", refresh=True)
+                        ])
+                    ])
+                ], style={'display': 'inline-block', 'marginBottom': 10, 'verticalAlign': 'bottom'})
+            ]),
+            #pie and bar graphs
             html.Div([
-                html.Label(children=['Type of violence:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                dcc.Graph(id='tof-chart'),
                 html.Div(
                     children=dmc.Popover(
                         [
                             dmc.PopoverTarget(
                                 dmc.ActionIcon(
-                                    DashIconify(icon="dashicons:info"),
-                                    size="xs"
+                                    DashIconify(icon="streamline:information-desk-solid", width=30),
+                                    size="lg"
                                 )
                             ),
                             dmc.PopoverDropdown(
                                 children=[
                                     dmc.Text(
-                                        children=[
-                                            html.B("Non-state conflict"), " is armed force between two organized groups, neither of "
-                                            "which is a state government, resulting in at least 25 battle-related deaths in a year."
-                                        ],
-                                    size="sm"
+                                        "In conflicts, typically two parties are involved."
                                     ),
                                     dmc.Text(
                                         children=[
-                                            html.B("One-sided violence"), " is the use of armed force by a government or organized group "
-                                            "against civilians, resulting in at least 25 deaths, excluding extrajudicial killings in custody."
-                                        ],
+                                                html.B("First-party fatalities"), ": Deaths sustained by one side. In state-based conflicts, this is usually " 
+                                                "the government. In one-sided violence, it is the perpetrating party. Always 0 for one-sided violence events."
+                                            ],
                                         size="sm"
                                     ),
                                     dmc.Text(
                                         children=[
-                                            html.B("State-based armed conflict"), " involves a dispute over government or territory, "
-                                            "where armed force between at least one government and another party results in "
-                                            "at least 25 battle-related deaths in a year."
-                                        ],
+                                                html.B("Second-party fatalities"), ": Deaths sustained by the other side. In state-based conflicts, this is "
+                                                "typically the rebel movement or a rival government. In one-sided violence, it refers to civilians. Always 0 for "
+                                                "one-sided violence events."
+                                            ],
                                         size="sm"
                                     ),
-                                    dmc.Text(
-                                        "source: Uppsala Conflict Data Program (UCDP)",
-                                        size="sm",
-                                        c="gray"
-                                    )
-                                ] 
-                            )
-                        ],
-                        width=400,
-                        position="bottom",
-                        withArrow=True,
-                        shadow="md",
-                        zIndex=2000
-                    ),
-                    style={'position': 'absolute', 'top': 5, 'left': 258, 'zIndex': 1}
-                ),
-                dcc.Dropdown(
-                    id='violence-variable',
-                    options=[{'label':v,'value':v} for v in sorted(df['type_of_violence'].unique())],
-                    value=None,
-                    multi=True,
-                    searchable=True,
-                    placeholder="Select a type of violence",
-                    style={'color': 'black', 'width': 276, 'height': 40}
-                )
-            ], style={'position': 'relative', 'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
-            html.Div([
-                dmc.Button(
-                    id="submit-btn-fo",
-                    children="Submit",
-                    size="md",
-                    color="black",
-                    style={'font-weight': 'bold', 'font-size': 15, 'width': 276, 'height': 40}
-                )
-            ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'bottom'})
-        ]),
-        #pie and bar graphs
-        html.Div([
-            html.Div([
-                dcc.Graph(id='tov-chart')
-            ], style={'display': 'inline-block', 'marginLeft': 10, 'marginRight': 20, 'width': 700, 'height': 450}),
-            html.Div([
-                dcc.Graph(id='fc-chart')
-            ], style={'display': 'inline-block', 'marginRight': 10, 'width': 700, 'height': 450})
-        ]),
-        #donut graphs
-        html.Div([
-            dcc.Graph(id='ft-chart'),
-            html.Div(
-                children=dmc.Popover(
-                    [
-                        dmc.PopoverTarget(
-                            dmc.ActionIcon(
-                                DashIconify(icon="streamline:information-desk-solid", width=30),
-                                size="lg"
-                            )
-                        ),
-                        dmc.PopoverDropdown(
-                            children=[
-                                dmc.Text(
-                                    "If a party killing unarmed civilians crosses the 25-death threshold in a year, all its events, "
-                                    "even those in years below the threshold, are included."
-                                ),
-                                dmc.Text(
-                                    "source: Uppsala Conflict Data Program (UCDP)",
-                                    c="gray"
-                                )
-                            ] 
-                        )
-                    ],
-                    width=200,
-                    position="bottom",
-                    withArrow=True,
-                    shadow="md",
-                    zIndex=2000
-                ),
-                style={'position': 'absolute', 'top': 25, 'left': 1380, 'zIndex': 1}
-            )
-        ], style={'position': 'relative', 'marginLeft': 10, 'marginRight': 10, 'width': 1420, 'height': 450}) 
-    ]
-)
-
-# FATALITIES DISTRIBUTION PAGE
-fd_layout = dmc.MantineProvider(
-    children=[
-        dmc.Title("Shattered Lives", order=1, style={'textAlign': 'center', 'color': 'red'}),
-        #menu and page title
-        html.Div([
-            html.Div([
-                dmc.Menu([
-                    dmc.MenuTarget(dmc.Burger()),
-                    dmc.MenuDropdown([
-                        dmc.MenuItem(dcc.Link("Worldwide Conflicts and Fatalities", href="/worldwide-conflicts-and-fatalities")),
-                        dmc.MenuItem(dcc.Link("Fatalities Causation", href="/fatalities-causation")),
-                        dmc.MenuItem(dcc.Link("Fatalities Distribution", href="/fatalities-distribution")),
-                        dmc.MenuItem(dcc.Link("Conflicts Details", href="/conflicts-details"))
-                    ])
-                ])
-            ], style={'display': 'inline-block', 'marginLeft': 10}),
-            html.Div([
-                dmc.Text("Fatalities Distribution", size="xl", fw=700)
-            ], style={'display': 'inline-block', 'marginLeft': 5})
-        ], style={'display': 'flex', 'alignItems': 'center'}),
-        #dropdowns
-        html.Div([
-            html.Div([
-                html.Label(children=['Year:'], style={'color': 'black', 'fontWeight': 'bold'}),
-                dcc.Dropdown(
-                    id='year-variable',
-                    options=[{'label':y,'value':y} for y in sorted(df['year'].unique())],
-                    value=None,
-                    multi=True,
-                    searchable=True,
-                    placeholder="Select a year",
-                    style={'color': 'black', 'width': 276, 'height': 40}
-                )
-            ], style={'display': 'inline-block', 'marginLeft': 10, 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
-            html.Div([
-                html.Label(children=['Region:'], style={'color': 'black', 'fontWeight': 'bold'}),
-                dcc.Dropdown(
-                    id='region-variable',
-                    options=[{'label':r,'value':r} for r in sorted(df['region'].unique())],
-                    value=None,
-                    multi=True,
-                    searchable=True,
-                    placeholder="Select a region",
-                    style={'color': 'black', 'width': 276, 'height': 40}
-                )
-            ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
-            html.Div([
-                html.Label(children=['Country:'], style={'color': 'black', 'fontWeight': 'bold'}),
-                dcc.Dropdown(
-                    id='country-variable',
-                    options=[{'label':c,'value':c} for c in sorted(df['country'].unique())],
-                    value=None,
-                    multi=True,
-                    searchable=True,
-                    placeholder="Select a country",
-                    style={'color': 'black', 'width': 276, 'height': 40}
-                )
-            ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
-            html.Div([
-                html.Label(children=['Type of violence:'], style={'color': 'black', 'fontWeight': 'bold'}),
-                html.Div(
-                    children=dmc.Popover(
-                        [
-                            dmc.PopoverTarget(
-                                dmc.ActionIcon(
-                                    DashIconify(icon="dashicons:info"),
-                                    size="xs"
-                                )
-                            ),
-                            dmc.PopoverDropdown(
-                                children=[
                                     dmc.Text(
                                         children=[
-                                            html.B("Non-state conflict"), " is armed force between two organized groups, neither of "
-                                            "which is a state government, resulting in at least 25 battle-related deaths in a year."
-                                        ],
-                                    size="sm"
+                                                html.B("Civilian fatalities"), ": Collateral damage during fighting between the two parties in state-based or "
+                                                "non-state conflicts. In one-sided violence, it is the number of civilians killed by the first party."
+                                            ],
+                                        size="sm"
                                     ),
                                     dmc.Text(
                                         children=[
-                                            html.B("One-sided violence"), " is the use of armed force by a government or organized group "
-                                            "against civilians, resulting in at least 25 deaths, excluding extrajudicial killings in custody."
-                                        ],
+                                                html.B("Unknown fatalities"), ": Deaths of individuals whose status is unknown."
+                                            ],
                                         size="sm"
                                     ),
                                     dmc.Text(
                                         children=[
-                                            html.B("State-based armed conflict"), " involves a dispute over government or territory, "
-                                            "where armed force between at least one government and another party results in "
-                                            "at least 25 battle-related deaths in a year."
+                                            html.I("Note: These numbers represent the best estimates of fatalities.")
                                         ],
-                                        size="sm"
+                                        size="sm",
+                                        c="gray"
                                     ),
                                     dmc.Text(
                                         "source: Uppsala Conflict Data Program (UCDP)",
@@ -502,151 +829,406 @@ fd_layout = dmc.MantineProvider(
                                 ] 
                             )
                         ],
-                        width=400,
+                        width=500,
                         position="bottom",
                         withArrow=True,
                         shadow="md",
                         zIndex=2000
                     ),
-                    style={'position': 'absolute', 'top': 5, 'left': 258, 'zIndex': 1}
-                ),
-                dcc.Dropdown(
-                    id='violence-variable',
-                    options=[{'label':v,'value':v} for v in sorted(df['type_of_violence'].unique())],
-                    value=None,
-                    multi=True,
-                    searchable=True,
-                    placeholder="Select a type of violence",
-                    style={'color': 'black', 'width': 276, 'height': 40}
+                    style={'position': 'absolute', 'top': 25, 'left': 1380, 'zIndex': 1}
                 )
-            ], style={'position': 'relative', 'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+            ], style={'position': 'relative', 'marginLeft': 10, 'marginRight': 10, 'width': 1420})
+        ]
+    )
+
+# CONFLICTS DETAILS PAGE
+# no dropdowns, so one layout serves every version; the grid's rows come from
+# the current dataset through update_cd_rows
+@lru_cache(maxsize=1)
+@phase("layout_cd")
+def cd_layout():
+    return dmc.MantineProvider(
+        children=[
+            dmc.Title("Shattered Lives", order=1, style={'textAlign': 'center', 'color': 'red'}),
+            #menu and page title
+            html.Div([
+                html.Div([
+                    dmc.Menu([
+                        dmc.MenuTarget(dmc.Burger()),
+                        dmc.MenuDropdown([
+                            dmc.MenuItem(dcc.Link("Worldwide Conflicts and Fatalities", href="/worldwide-conflicts-and-fatalities")),
+                            dmc.MenuItem(dcc.Link("Fatalities Causation", href="/fatalities-causation")),
+                            dmc.MenuItem(dcc.Link("Fatalities Distribution", href="/fatalities-distribution")),
+                            dmc.MenuItem(dcc.Link("Fatalities Over Time", href="/fatalities-over-time")),
+                            dmc.MenuItem(dcc.Link("Conflicts Details", href="/conflicts-details")),
+                            dmc.MenuItem(dcc.Link("Conflicts Map", href="/conflicts-map"))
+                        ])
+                    ])
+                ], style={'display': 'inline-block', 'marginLeft': 10}),
+                html.Div([
+                    dmc.Text("Conflicts Details", size="xl", fw=700)
+                ], style={'display': 'inline-block', 'marginLeft': 5})
+            ], style={'display': 'flex', 'alignItems': 'center'}),
+            #table grid
             html.Div([
-                dmc.Button(
-                    id="submit-btn-fd",
-                    children="Submit",
-                    size="md",
-                    color="black",
-                    style={'font-weight': 'bold', 'font-size': 15, 'width': 276, 'height': 40}
+                dag.AgGrid(
+                    id="conflicts-details",
+                    className="ag-theme-material",
+                    rowModelType="infinite",
+                    columnDefs=[
+                        {'field': 'year', 'headerName': 'Year', 'filter': 'agNumberColumnFilter'},
+                        {'field': 'region', 'headerName': 'Region'},
+                        {'field': 'country', 'headerName': 'Country'},
+                        {'field': 'conflict_name', 'headerName': 'Conflict'},
+                        {'field': 'conflict_period', 'headerName': 'Duration (days)', 'filter': 'agNumberColumnFilter'},
+                        {'field': 'best', 'headerName': 'Total fatalities', 'filter': 'agNumberColumnFilter'},
+                        {'field': 'where_prec', 'headerName': 'Location precision'},
+                        {'field': 'date_prec', 'headerName': 'Date precision'}
+                    ],
+                    columnSize = "autoSize",
+                    defaultColDef = {"filter": True, "wrapHeaderText": True},
+                    dashGridOptions = {"animateRows": True, "pagination": True, "paginationPageSize":12, "cacheBlockSize": 120, "maxBlocksInCache": 10},
+                    style = {"height": 700}
                 )
-            ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'bottom'})
-        ]),
-        #pie and bar graphs
-        html.Div([
-            dcc.Graph(id='tof-chart'),
-            html.Div(
-                children=dmc.Popover(
-                    [
-                        dmc.PopoverTarget(
-                            dmc.ActionIcon(
-                                DashIconify(icon="streamline:information-desk-solid", width=30),
-                                size="lg"
-                            )
-                        ),
-                        dmc.PopoverDropdown(
-                            children=[
-                                dmc.Text(
-                                    "In conflicts, typically two parties are involved."
-                                ),
-                                dmc.Text(
-                                    children=[
-                                            html.B("First-party fatalities"), ": Deaths sustained by one side. In state-based conflicts, this is usually " 
-                                            "the government. In one-sided violence, it is the perpetrating party. Always 0 for one-sided violence events."
-                                        ],
-                                    size="sm"
-                                ),
-                                dmc.Text(
-                                    children=[
-                                            html.B("Second-party fatalities"), ": Deaths sustained by the other side. In state-based conflicts, this is "
-                                            "typically the rebel movement or a rival government. In one-sided violence, it refers to civilians. Always 0 for "
-                                            "one-sided violence events."
-                                        ],
-                                    size="sm"
-                                ),
-                                dmc.Text(
-                                    children=[
-                                            html.B("Civilian fatalities"), ": Collateral damage during fighting between the two parties in state-based or "
-                                            "non-state conflicts. In one-sided violence, it is the number of civilians killed by the first party."
-                                        ],
-                                    size="sm"
-                                ),
-                                dmc.Text(
-                                    children=[
-                                            html.B("Unknown fatalities"), ": Deaths of individuals whose status is unknown."
-                                        ],
-                                    size="sm"
+            ], style={'marginLeft': 10, 'marginRight': 10, 'width': 1420})
+        ]
+    )
+
+# FATALITIES OVER TIME PAGE
+# keyed by dataset version so new candidate events reach the dropdowns
+@lru_cache(maxsize=2)
+@phase("layout_ts")
+def ts_layout(version):
+    return dmc.MantineProvider(
+        children=[
+            dmc.Title("Shattered Lives", order=1, style={'textAlign': 'center', 'color': 'red'}),
+            #menu and page title
+            html.Div([
+                html.Div([
+                    dmc.Menu([
+                        dmc.MenuTarget(dmc.Burger()),
+                        dmc.MenuDropdown([
+                            dmc.MenuItem(dcc.Link("Worldwide Conflicts and Fatalities", href="/worldwide-conflicts-and-fatalities")),
+                            dmc.MenuItem(dcc.Link("Fatalities Causation", href="/fatalities-causation")),
+                            dmc.MenuItem(dcc.Link("Fatalities Distribution", href="/fatalities-distribution")),
+                            dmc.MenuItem(dcc.Link("Fatalities Over Time", href="/fatalities-over-time")),
+                            dmc.MenuItem(dcc.Link("Conflicts Details", href="/conflicts-details")),
+                            dmc.MenuItem(dcc.Link("Conflicts Map", href="/conflicts-map"))
+                        ])
+                    ])
+                ], style={'display': 'inline-block', 'marginLeft': 10}),
+                html.Div([
+                    dmc.Text("Fatalities Over Time", size="xl", fw=700)
+                ], style={'display': 'inline-block', 'marginLeft': 5})
+            ], style={'display': 'flex', 'alignItems': 'center'}),
+            #dropdowns
+            html.Div([
+                html.Div([
+                    html.Label(children=['Year:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                    dcc.Dropdown(
+                        id='year-variable',
+                        options=dropdown_options()['year'],
+                        value=None,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Select a year",
+                        style={'color': 'black', 'width': 276, 'height': 40}
+                    )
+                ], style={'display': 'inline-block', 'marginLeft': 10, 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    html.Label(children=['Region:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                    dcc.Dropdown(
+                        id='region-variable',
+                        options=dropdown_options()['region'],
+                        value=None,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Select a region",
+                        style={'color': 'black', 'width': 276, 'height': 40}
+                    )
+                ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    html.Label(children=['Country:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                    dcc.Dropdown(
+                        id='country-variable',
+                        options=dropdown_options()['country'],
+                        value=None,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Select a country",
+                        style={'color': 'black', 'width': 276, 'height': 40}
+                    )
+                ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    html.Label(children=['Type of violence:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                    html.Div(
+                        children=dmc.Popover(
+                            [
+                                dmc.PopoverTarget(
+                                    dmc.ActionIcon(
+                                        DashIconify(icon="dashicons:info"),
+                                        size="xs"
+                                    )
                                 ),
-                                dmc.Text(
+                                dmc.PopoverDropdown(
                                     children=[
-                                        html.I("Note: These numbers represent the best estimates of fatalities.")
-                                    ],
-                                    size="sm",
-                                    c="gray"
-                                ),
-                                dmc.Text(
-                                    "source: Uppsala Conflict Data Program (UCDP)",
-                                    size="sm",
-                                    c="gray"
+                                        dmc.Text(
+                                            children=[
+                                                html.B("Non-state conflict"), " is armed force between two organized groups, neither of "
+                                                "which is a state government, resulting in at least 25 battle-related deaths in a year."
+                                            ],
+                                        size="sm"
+                                        ),
+                                        dmc.Text(
+                                            children=[
+                                                html.B("One-sided violence"), " is the use of armed force by a government or organized group "
+                                                "against civilians, resulting in at least 25 deaths, excluding extrajudicial killings in custody."
+                                            ],
+                                            size="sm"
+                                        ),
+                                        dmc.Text(
+                                            children=[
+                                                html.B("State-based armed conflict"), " involves a dispute over government or territory, "
+                                                "where armed force between at least one government and another party results in "
+                                                "at least 25 battle-related deaths in a year."
+                                            ],
+                                            size="sm"
+                                        ),
+                                        dmc.Text(
+                                            "source: Uppsala Conflict Data Program (UCDP)",
+                                            size="sm",
+                                            c="gray"
+                                        )
+                                    ] 
                                 )
-                            ] 
-                        )
+                            ],
+                            width=400,
+                            position="bottom",
+                            withArrow=True,
+                            shadow="md",
+                            zIndex=2000
+                        ),
+                        style={'position': 'absolute', 'top': 5, 'left': 258, 'zIndex': 1}
+                    ),
+                    dcc.Dropdown(
+                        id='violence-variable',
+                        options=dropdown_options()['type_of_violence'],
+                        value=None,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Select a type of violence",
+                        style={'color': 'black', 'width': 276, 'height': 40}
+                    )
+                ], style={'position': 'relative', 'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    dmc.Button(
+                        id="submit-btn-ts",
+                        children="Submit",
+                        size="md",
+                        color="black",
+                        style={'font-weight': 'bold', 'font-size': 15, 'width': 276, 'height': 40}
+                    )
+                ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'bottom'}),
+                html.Div([
+                    dmc.Menu([
+                        dmc.MenuTarget(
+                            dmc.ActionIcon(
+                                DashIconify(icon="material-symbols:download", width=24),
+                                size=40,
+                                variant="outline",
+                                color="black"
+                            )
+                        ),
+                        dmc.MenuDropdown([
+                            dmc.MenuLabel("Export selected events"),
+                            dmc.MenuItem("CSV", id='export-csv-ts', href="/api/export?format=csv", refresh=True),
+                            dmc.MenuItem("Parquet", id='export-parquet-ts', href="/api/export?format=parquet", refresh=True)
+                        ])
+                    ])
+                ], style={'display': 'inline-block', 'marginBottom': 10, 'verticalAlign': 'bottom'})
+            ]),
+            #resolution and line chart
+            html.Div([
+                dmc.SegmentedControl(
+                    id='ts-resolution',
+                    value='month',
+                    data=[
+                        {'value': 'day', 'label': 'Daily'},
+                        {'value': 'month', 'label': 'Monthly'},
+                        {'value': 'year', 'label': 'Yearly'}
                     ],
-                    width=500,
-                    position="bottom",
-                    withArrow=True,
-                    shadow="md",
-                    zIndex=2000
-                ),
-                style={'position': 'absolute', 'top': 25, 'left': 1380, 'zIndex': 1}
-            )
-        ], style={'position': 'relative', 'marginLeft': 10, 'marginRight': 10, 'width': 1420})
-    ]
-)
+                    color='red'
+                )
+            ], style={'marginLeft': 10, 'marginBottom': 10}),
+            html.Div([
+                dcc.Graph(id='ts-chart', style={'height': 600})
+            ], style={'marginLeft': 10, 'marginRight': 10, 'width': 1420})
+        ]
+    )
 
-# CONFLICTS DETAILS PAGE
-cd_layout = dmc.MantineProvider(
-    children=[
-        dmc.Title("Shattered Lives", order=1, style={'textAlign': 'center', 'color': 'red'}),
-        #menu and page title
-        html.Div([
+# CONFLICTS MAP PAGE
+# keyed by dataset version so new candidate events reach the dropdowns
+@lru_cache(maxsize=2)
+@phase("layout_cm")
+def cm_layout(version):
+    return dmc.MantineProvider(
+        children=[
+            dmc.Title("Shattered Lives", order=1, style={'textAlign': 'center', 'color': 'red'}),
+            #menu and page title
             html.Div([
-                dmc.Menu([
-                    dmc.MenuTarget(dmc.Burger()),
-                    dmc.MenuDropdown([
-                        dmc.MenuItem(dcc.Link("Worldwide Conflicts and Fatalities", href="/worldwide-conflicts-and-fatalities")),
-                        dmc.MenuItem(dcc.Link("Fatalities Causation", href="/fatalities-causation")),
-                        dmc.MenuItem(dcc.Link("Fatalities Distribution", href="/fatalities-distribution")),
-                        dmc.MenuItem(dcc.Link("Conflicts Details", href="/conflicts-details"))
+                html.Div([
+                    dmc.Menu([
+                        dmc.MenuTarget(dmc.Burger()),
+                        dmc.MenuDropdown([
+                            dmc.MenuItem(dcc.Link("Worldwide Conflicts and Fatalities", href="/worldwide-conflicts-and-fatalities")),
+                            dmc.MenuItem(dcc.Link("Fatalities Causation", href="/fatalities-causation")),
+                            dmc.MenuItem(dcc.Link("Fatalities Distribution", href="/fatalities-distribution")),
+                            dmc.MenuItem(dcc.Link("Fatalities Over Time", href="/fatalities-over-time")),
+                            dmc.MenuItem(dcc.Link("Conflicts Details", href="/conflicts-details")),
+                            dmc.MenuItem(dcc.Link("Conflicts Map", href="/conflicts-map"))
+                        ])
                     ])
-                ])
-            ], style={'display': 'inline-block', 'marginLeft': 10}),
+                ], style={'display': 'inline-block', 'marginLeft': 10}),
+                html.Div([
+                    dmc.Text("Conflicts Map", size="xl", fw=700)
+                ], style={'display': 'inline-block', 'marginLeft': 5})
+            ], style={'display': 'flex', 'alignItems': 'center'}),
+            #dropdowns
             html.Div([
-                dmc.Text("Conflicts Details", size="xl", fw=700)
-            ], style={'display': 'inline-block', 'marginLeft': 5})
-        ], style={'display': 'flex', 'alignItems': 'center'}),
-        #table grid
-        html.Div([
-            dag.AgGrid(
-                id="conflicts-details",
-                className="ag-theme-material",
-                rowData=dff_cd.to_dict("records"),
-                columnDefs=[
-                    {'field': 'year', 'headerName': 'Year'},
-                    {'field': 'region', 'headerName': 'Region'},
-                    {'field': 'country', 'headerName': 'Country'},
-                    {'field': 'conflict_name', 'headerName': 'Conflict'},
-                    {'field': 'conflict_period', 'headerName': 'Duration (days)'},
-                    {'field': 'best', 'headerName': 'Total fatalities'},
-                    {'field': 'where_prec', 'headerName': 'Location precision'},
-                    {'field': 'date_prec', 'headerName': 'Date precision'}
-                ],
-                columnSize = "autoSize",
-                defaultColDef = {"filter": True, "wrapHeaderText": True},
-                dashGridOptions = {"animateRows": True, "pagination": True, "paginationPageSize":12},
-                style = {"height": 700}
-            )
-        ], style={'marginLeft': 10, 'marginRight': 10, 'width': 1420})
-    ]
-)
+                html.Div([
+                    html.Label(children=['Year:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                    dcc.Dropdown(
+                        id='year-variable',
+                        options=dropdown_options()['year'],
+                        value=None,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Select a year",
+                        style={'color': 'black', 'width': 276, 'height': 40}
+                    )
+                ], style={'display': 'inline-block', 'marginLeft': 10, 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    html.Label(children=['Region:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                    dcc.Dropdown(
+                        id='region-variable',
+                        options=dropdown_options()['region'],
+                        value=None,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Select a region",
+                        style={'color': 'black', 'width': 276, 'height': 40}
+                    )
+                ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    html.Label(children=['Country:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                    dcc.Dropdown(
+                        id='country-variable',
+                        options=dropdown_options()['country'],
+                        value=None,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Select a country",
+                        style={'color': 'black', 'width': 276, 'height': 40}
+                    )
+                ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    html.Label(children=['Type of violence:'], style={'color': 'black', 'fontWeight': 'bold'}),
+                    html.Div(
+                        children=dmc.Popover(
+                            [
+                                dmc.PopoverTarget(
+                                    dmc.ActionIcon(
+                                        DashIconify(icon="dashicons:info"),
+                                        size="xs"
+                                    )
+                                ),
+                                dmc.PopoverDropdown(
+                                    children=[
+                                        dmc.Text(
+                                            children=[
+                                                html.B("Non-state conflict"), " is armed force between two organized groups, neither of "
+                                                "which is a state government, resulting in at least 25 battle-related deaths in a year."
+                                            ],
+                                        size="sm"
+                                        ),
+                                        dmc.Text(
+                                            children=[
+                                                html.B("One-sided violence"), " is the use of armed force by a government or organized group "
+                                                "against civilians, resulting in at least 25 deaths, excluding extrajudicial killings in custody."
+                                            ],
+                                            size="sm"
+                                        ),
+                                        dmc.Text(
+                                            children=[
+                                                html.B("State-based armed conflict"), " involves a dispute over government or territory, "
+                                                "where armed force between at least one government and another party results in "
+                                                "at least 25 battle-related deaths in a year."
+                                            ],
+                                            size="sm"
+                                        ),
+                                        dmc.Text(
+                                            "source: Uppsala Conflict Data Program (UCDP)",
+                                            size="sm",
+                                            c="gray"
+                                        )
+                                    ] 
+                                )
+                            ],
+                            width=400,
+                            position="bottom",
+                            withArrow=True,
+                            shadow="md",
+                            zIndex=2000
+                        ),
+                        style={'position': 'absolute', 'top': 5, 'left': 258, 'zIndex': 1}
+                    ),
+                    dcc.Dropdown(
+                        id='violence-variable',
+                        options=dropdown_options()['type_of_violence'],
+                        value=None,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Select a type of violence",
+                        style={'color': 'black', 'width': 276, 'height': 40}
+                    )
+                ], style={'position': 'relative', 'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'top'}),
+                html.Div([
+                    dmc.Button(
+                        id="submit-btn-cm",
+                        children="Submit",
+                        size="md",
+                        color="black",
+                        style={'font-weight': 'bold', 'font-size': 15, 'width': 276, 'height': 40}
+                    )
+                ], style={'display': 'inline-block', 'marginRight': 10, 'marginBottom': 10, 'verticalAlign': 'bottom'}),
+                html.Div([
+                    dmc.Menu([
+                        dmc.MenuTarget(
+                            dmc.ActionIcon(
+                                DashIconify(icon="material-symbols:download", width=24),
+                                size=40,
+                                variant="outline",
+                                color="black"
+                            )
+                        ),
+                        dmc.MenuDropdown([
+                            dmc.MenuLabel("Export selected events"),
+                            dmc.MenuItem("CSV", id='export-csv-cm', href="/api/export?format=csv", refresh=True),
+                            dmc.MenuItem("Parquet", id='export-parquet-cm', href="/api/export?format=parquet", refresh=True)
+                        ])
+                    ])
+                ], style={'display': 'inline-block', 'marginBottom': 10, 'verticalAlign': 'bottom'})
+            ]),
+            #map
+            html.Div([
+                dcc.Graph(
+                    id='cm-chart',
+                    config={'scrollZoom': True},
+                    style={'height': 700}
+                )
+            ], style={'marginLeft': 10, 'marginRight': 10, 'width': 1420})
+        ]
+    )
 
 # WELCOME PAGE 
 wlc_page_layout = html.Div(
@@ -679,12 +1261,21 @@ wlc_page_layout = html.Div(
 )
 
 # APP LAYOUT
-app.layout = dmc.MantineProvider(
-    children=[
-        dcc.Location(id='url', refresh=False),  
-        html.Div(id='page-content')
-    ]
-)
+# a function so every page load gets the hierarchy of the current dataset
+def serve_layout():
+    return dmc.MantineProvider(
+        children=[
+            dcc.Location(id='url', refresh=False),  
+            dcc.Store(id='hierarchy', data=dataset.current().hierarchy_data),
+            html.Div(id='page-content')
+        ]
+    )
+
+app.layout = serve_layout
+
+# layouts are built lazily, per worker and version, on first visit; their
+# layout_* phases are logged then, after this report has been written
+write_report(os.path.join(CACHE_DIR, "startup-profile.json"), dataset=LOAD_REPORT)
 
 # PAGES LINK
 @app.callback(
@@ -693,233 +1284,112 @@ app.layout = dmc.MantineProvider(
 )
 def display_page(pathname):
     if pathname == '/worldwide-conflicts-and-fatalities':
-        return wcf_layout
+        return wcf_layout(dataset.current().version)
     elif pathname == '/fatalities-causation':
-        return fo_layout
+        return fo_layout(dataset.current().version)
     elif pathname == '/fatalities-distribution':
-        return fd_layout
+        return fd_layout(dataset.current().version)
     elif pathname == '/conflicts-details':
-        return cd_layout
+        return cd_layout()
+    elif pathname == '/fatalities-over-time':
+        return ts_layout(dataset.current().version)
+    elif pathname == '/conflicts-map':
+        return cm_layout(dataset.current().version)
     else:
         return wlc_page_layout
 
 # REGION OPTIONS BASED ON YEAR
-@app.callback(
+app.clientside_callback(
+    """
+    function(years, h) {
+        var picked = new Set();
+        if (years && years.length) {
+            years.forEach(function(y) {
+                (h.years[y] || []).forEach(function(branch) { picked.add(branch[0]); });
+            });
+        } else {
+            h.regions.forEach(function(_, i) { picked.add(i); });
+        }
+        return Array.from(picked).sort(function(a, b) { return a - b; }).map(function(i) {
+            return {label: h.regions[i], value: h.regions[i]};
+        });
+    }
+    """,
     Output('region-variable', 'options'),
-    Input('year-variable', 'value')
+    Input('year-variable', 'value'),
+    State('hierarchy', 'data')
 )
-def set_region_options_on_year(selected_year):
-    if selected_year:
-        fyr = df[df['year'].isin(selected_year)]['region'].unique()
-        return [{'label': region, 'value': region} for region in fyr]
-    else:
-        return [{'label': region, 'value': region} for region in sorted(df['region'].unique())]
 
 # COUNTRIES OPTIONS BASED ON YEAR AND REGION
-@app.callback(
+app.clientside_callback(
+    """
+    function(years, regions, h) {
+        var wanted = regions && regions.length ? new Set(regions) : null;
+        var picked = new Set();
+        (years && years.length ? years : Object.keys(h.years)).forEach(function(y) {
+            (h.years[y] || []).forEach(function(branch) {
+                if (!wanted || wanted.has(h.regions[branch[0]])) {
+                    branch[1].forEach(function(c) { picked.add(c); });
+                }
+            });
+        });
+        return Array.from(picked).sort(function(a, b) { return a - b; }).map(function(i) {
+            return {label: h.countries[i], value: h.countries[i]};
+        });
+    }
+    """,
     Output('country-variable', 'options'),
     [Input('year-variable', 'value'),
-     Input('region-variable', 'value')]
-)
-def set_country_options(selected_year, selected_region):
-    fyrc = df.copy()
-    if selected_year:
-        fyrc = df[df['year'].isin(selected_year)]
-    if selected_region:
-        fyrc = df[df['region'].isin(selected_region)]
-    cf = sorted(fyrc['country'].unique())
-    return [{'label': country, 'value': country} for country in cf]
-    
-# YEARS CARD
-@app.callback(
-    Output('selected-year-card', 'children'),
-    Input('submit-btn-wcf', 'n_clicks'),
-    State('year-variable', 'value'),
-    State('region-variable', 'value'),
-    State('country-variable', 'value'),
-    State('violence-variable', 'value')
+     Input('region-variable', 'value')],
+    State('hierarchy', 'data')
 )
-def update_selected_year_count(_, selected_year, selected_region, selected_country, selected_violence):
-    if selected_year and selected_region and selected_country and selected_violence:
-        dff_y = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['country'].isin(selected_country)) & (df['type_of_violence'].isin(selected_violence))]
-        year_count = dff_y['year'].nunique()
-    elif selected_year and selected_region and selected_country:
-        dff_y = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['country'].isin(selected_country))]
-        year_count = dff_y['year'].nunique()
-    elif selected_year and selected_region and selected_violence:
-        dff_y = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['type_of_violence'].isin(selected_violence))]
-        year_count = dff_y['year'].nunique()
-    elif selected_year and selected_region:
-        dff_y = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region))]
-        year_count = dff_y['year'].nunique()
-    elif selected_year and selected_violence:
-        dff_y = df[(df['year'].isin(selected_year)) & (df['type_of_violence'].isin(selected_violence))]
-        year_count = dff_y['year'].nunique()
-    elif selected_region and selected_country:
-        dff_y = df[(df['region'].isin(selected_region)) & (df['country'].isin(selected_country))]
-        year_count = dff_y['year'].nunique()
-    elif selected_region and selected_violence:
-        dff_y = df[(df['region'].isin(selected_region)) & (df['type_of_violence'].isin(selected_violence))]
-        year_count = dff_y['year'].nunique()
-    elif selected_year:
-        dff_y = df[(df['year'].isin(selected_year))]
-        year_count = dff_y['year'].nunique()
-    elif selected_region:
-        dff_y = df[(df['region'].isin(selected_region))]
-        year_count = dff_y['year'].nunique()
-    elif selected_country:
-        dff_y = df[(df['country'].isin(selected_country))]
-        year_count = dff_y['year'].nunique()
-    elif selected_violence:
-        dff_y = df[(df['type_of_violence'].isin(selected_violence))]
-        year_count = dff_y['year'].nunique()
-    else:
-        year_count = df['year'].nunique()
-    return [html.Span("Total years"), html.Span(year_count)]
 
-# REGIONS CARD
-@app.callback(
-    Output('selected-region-card', 'children'),
-    Input('submit-btn-wcf', 'n_clicks'),
-    State('year-variable', 'value'),
-    State('region-variable', 'value'),
-    State('country-variable', 'value'),
-    State('violence-variable', 'value')
-)
-def update_selected_region_count(_, selected_year, selected_region, selected_country, selected_violence):
-    if selected_year and selected_region and selected_country and selected_violence:
-        dff_r = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['country'].isin(selected_country)) & (df['type_of_violence'].isin(selected_violence))]
-        region_count = dff_r['region'].nunique()
-    elif selected_year and selected_region and selected_country:
-        dff_r = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['country'].isin(selected_country))]
-        region_count = dff_r['region'].nunique()
-    elif selected_year and selected_region and selected_violence:
-        dff_r = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['type_of_violence'].isin(selected_violence))]
-        region_count = dff_r['region'].nunique()
-    elif selected_year and selected_region:
-        dff_r = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region))]
-        region_count = dff_r['region'].nunique()
-    elif selected_year and selected_violence:
-        dff_r = df[(df['year'].isin(selected_year)) & (df['type_of_violence'].isin(selected_violence))]
-        region_count = dff_r['region'].nunique()
-    elif selected_region and selected_country:
-        dff_r = df[(df['region'].isin(selected_region)) & (df['country'].isin(selected_country))]
-        region_count = dff_r['region'].nunique()
-    elif selected_region and selected_violence:
-        dff_r = df[(df['region'].isin(selected_region)) & (df['type_of_violence'].isin(selected_violence))]
-        region_count = dff_r['region'].nunique()
-    elif selected_year:
-        dff_r = df[(df['year'].isin(selected_year))]
-        region_count = dff_r['region'].nunique()
-    elif selected_region:
-        dff_r = df[(df['region'].isin(selected_region))]
-        region_count = dff_r['region'].nunique()
-    elif selected_country:
-        dff_r = df[(df['country'].isin(selected_country))]
-        region_count = dff_r['region'].nunique()
-    elif selected_violence:
-        dff_r = df[(df['type_of_violence'].isin(selected_violence))]
-        region_count = dff_r['region'].nunique()
-    else:
-        region_count = df['region'].nunique()
-    return [html.Span("Total regions"), html.Span(region_count)]
+# EXPORT LINKS FOLLOW THE SUBMITTED SELECTION
+# like the charts, the links only change on submit, so a download always holds
+# the events behind the chart on screen
+for page in ['wcf', 'fo', 'fd', 'ts', 'cm']:
+    app.clientside_callback(
+        """
+        function(_, years, regions, countries, violence) {
+            var params = [];
+            [['year', years], ['region', regions], ['country', countries], ['type_of_violence', violence]].forEach(function(p) {
+                (p[1] || []).forEach(function(v) { params.push(p[0] + '=' + encodeURIComponent(v)); });
+            });
+            var query = params.length ? '&' + params.join('&') : '';
+            return ['/api/export?format=csv' + query, '/api/export?format=parquet' + query];
+        }
+        """,
+        Output('export-csv-' + page, 'href'),
+        Output('export-parquet-' + page, 'href'),
+        Input('submit-btn-' + page, 'n_clicks'),
+        State('year-variable', 'value'),
+        State('region-variable', 'value'),
+        State('country-variable', 'value'),
+        State('violence-variable', 'value')
+    )
 
-# COUNTRIES CARD
+# CONFLICTS DETAILS GRID ROWS
 @app.callback(
-    Output('selected-country-card', 'children'),
-    Input('submit-btn-wcf', 'n_clicks'),
-    State('year-variable', 'value'),
-    State('region-variable', 'value'),
-    State('country-variable', 'value'),
-    State('violence-variable', 'value')
+    Output('conflicts-details', 'getRowsResponse'),
+    Input('conflicts-details', 'getRowsRequest')
 )
-def update_selected_country_count(_, selected_year, selected_region, selected_country, selected_violence):
-    if selected_year and selected_region and selected_country and selected_violence:
-        dff_c = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['country'].isin(selected_country)) & (df['type_of_violence'].isin(selected_violence))]
-        country_count = dff_c['country'].nunique()
-    elif selected_year and selected_region and selected_country:
-        dff_c = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['country'].isin(selected_country))]
-        country_count = dff_c['country'].nunique()
-    elif selected_year and selected_region and selected_violence:
-        dff_c = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['type_of_violence'].isin(selected_violence))]
-        country_count = dff_c['country'].nunique()
-    elif selected_year and selected_region:
-        dff_c = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region))]
-        country_count = dff_c['country'].nunique()
-    elif selected_year and selected_violence:
-        dff_c = df[(df['year'].isin(selected_year)) & (df['type_of_violence'].isin(selected_violence))]
-        country_count = dff_c['country'].nunique()
-    elif selected_region and selected_country:
-        dff_c = df[(df['region'].isin(selected_region)) & (df['country'].isin(selected_country))]
-        country_count = dff_c['country'].nunique()
-    elif selected_region and selected_violence:
-        dff_c = df[(df['region'].isin(selected_region)) & (df['type_of_violence'].isin(selected_violence))]
-        country_count = dff_c['country'].nunique()
-    elif selected_year:
-        dff_c = df[(df['year'].isin(selected_year))]
-        country_count = dff_c['country'].nunique()
-    elif selected_region:
-        dff_c = df[(df['region'].isin(selected_region))]
-        country_count = dff_c['country'].nunique()
-    elif selected_country:
-        dff_c = df[(df['country'].isin(selected_country))]
-        country_count = dff_c['country'].nunique()
-    elif selected_violence:
-        dff_c = df[(df['type_of_violence'].isin(selected_violence))]
-        country_count = dff_c['country'].nunique()
-    else:
-        country_count = df['country'].nunique()
-    return [html.Span("Total countries"), html.Span(country_count)]
+def update_cd_rows(request):
+    if not request:
+        return dash.no_update
+    ds = dataset.current()
+    with metrics.timed("filter_sort"):
+        rows = ds.grid_rows(json.dumps(request.get('filterModel') or {}, sort_keys=True), json.dumps(request.get('sortModel') or []))
+    with metrics.timed("records"):
+        block = ds.details.iloc[rows[request['startRow']:request['endRow']]]
+        records = block[CD_COLUMNS].to_dict('records')
+    return {'rowData': records, 'rowCount': len(rows)}
 
-# CONFLICTS CARD
+# YEARS, REGIONS, COUNTRIES, CONFLICTS AND FATALITIES CARDS
 @app.callback(
+    Output('selected-year-card', 'children'),
+    Output('selected-region-card', 'children'),
+    Output('selected-country-card', 'children'),
     Output('conflict-count-card', 'children'),
-    Input('submit-btn-wcf', 'n_clicks'),
-    State('year-variable', 'value'),
-    State('region-variable', 'value'),
-    State('country-variable', 'value'),
-    State('violence-variable', 'value')
-)
-def update_conflict_count_count(_, selected_year, selected_region, selected_country, selected_violence):
-    if selected_year and selected_region and selected_country and selected_violence:
-        dff_cc = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['country'].isin(selected_country)) & (df['type_of_violence'].isin(selected_violence))]
-        conflict_count = dff_cc['id'].count()
-    elif selected_year and selected_region and selected_country:
-        dff_cc = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['country'].isin(selected_country))]
-        conflict_count = dff_cc['id'].count()
-    elif selected_year and selected_region and selected_violence:
-        dff_cc = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['type_of_violence'].isin(selected_violence))]
-        conflict_count = dff_cc['id'].count()
-    elif selected_year and selected_region:
-        dff_cc = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region))]
-        conflict_count = dff_cc['id'].count()
-    elif selected_year and selected_violence:
-        dff_cc = df[(df['year'].isin(selected_year)) & (df['type_of_violence'].isin(selected_violence))]
-        conflict_count = dff_cc['id'].count()
-    elif selected_region and selected_country:
-        dff_cc = df[(df['region'].isin(selected_region)) & (df['country'].isin(selected_country))]
-        conflict_count = dff_cc['id'].count()
-    elif selected_region and selected_violence:
-        dff_cc = df[(df['region'].isin(selected_region)) & (df['type_of_violence'].isin(selected_violence))]
-        conflict_count = dff_cc['id'].count()
-    elif selected_year:
-        dff_cc = df[df['year'].isin(selected_year)]
-        conflict_count = dff_cc['id'].count()
-    elif selected_region:
-        dff_cc = df[df['region'].isin(selected_region)]
-        conflict_count = dff_cc['id'].count()
-    elif selected_country:
-        dff_cc = df[df['country'].isin(selected_country)]
-        conflict_count = dff_cc['id'].count()
-    elif selected_violence:
-        dff_cc = df[df['type_of_violence'].isin(selected_violence)]
-        conflict_count = dff_cc['id'].count()
-    else:
-        conflict_count = df['id'].count()
-    return [html.Span("Total conflicts"), html.Span(conflict_count)]
-
-# FATALITIES CARD
-@app.callback(
     Output('fatality-sum-card', 'children'),
     Input('submit-btn-wcf', 'n_clicks'),
     State('year-variable', 'value'),
@@ -927,43 +1397,15 @@ def update_conflict_count_count(_, selected_year, selected_region, selected_coun
     State('country-variable', 'value'),
     State('violence-variable', 'value')
 )
-def update_fatality_sum_count(_, selected_year, selected_region, selected_country, selected_violence):
-    if selected_year and selected_region and selected_country and selected_violence:
-        dff_f = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['country'].isin(selected_country)) & (df['type_of_violence'].isin(selected_violence))]
-        fatality_count = dff_f['best'].sum()
-    elif selected_year and selected_region and selected_country:
-        dff_f = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['country'].isin(selected_country))]
-        fatality_count = dff_f['best'].sum()
-    elif selected_year and selected_region and selected_violence:
-        dff_f = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['type_of_violence'].isin(selected_violence))]
-        fatality_count = dff_f['best'].sum()
-    elif selected_year and selected_region:
-        dff_f = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region))]
-        fatality_count = dff_f['best'].sum()
-    elif selected_year and selected_violence:
-        dff_f = df[(df['year'].isin(selected_year)) & (df['type_of_violence'].isin(selected_violence))]
-        fatality_count = dff_f['best'].sum()
-    elif selected_region and selected_country:
-        dff_f = df[(df['region'].isin(selected_region)) & (df['country'].isin(selected_country))]
-        fatality_count = dff_f['best'].sum()
-    elif selected_region and selected_violence:
-        dff_f = df[(df['region'].isin(selected_region)) & (df['type_of_violence'].isin(selected_violence))]
-        fatality_count = dff_f['best'].sum()
-    elif selected_year:
-        dff_f = df[df['year'].isin(selected_year)]
-        fatality_count = dff_f['best'].sum()
-    elif selected_region:
-        dff_f = df[df['region'].isin(selected_region)]
-        fatality_count = dff_f['best'].sum()
-    elif selected_country:
-        dff_f = df[df['country'].isin(selected_country)]
-        fatality_count = dff_f['best'].sum()
-    elif selected_violence:
-        dff_f = df[df['type_of_violence'].isin(selected_violence)]
-        fatality_count = dff_f['best'].sum()
-    else:
-        fatality_count = df['best'].sum()
-    return [html.Span("Total fatalities"), html.Span(fatality_count)]
+def update_wcf_cards(_, selected_year, selected_region, selected_country, selected_violence):
+    totals = select_cells(selected_year, selected_region, selected_country, selected_violence).aggregate('totals', cell_totals)
+    return (
+        [html.Span("Total years"), html.Span(totals['years'])],
+        [html.Span("Total regions"), html.Span(totals['regions'])],
+        [html.Span("Total countries"), html.Span(totals['countries'])],
+        [html.Span("Total conflicts"), html.Span(totals['conflicts'])],
+        [html.Span("Total fatalities"), html.Span(totals['fatalities'])]
+    )
 
 # WORLDWIDE CONFLICTS AND FATALITIES TREEMAP CHART
 @app.callback(
@@ -974,35 +1416,9 @@ def update_fatality_sum_count(_, selected_year, selected_region, selected_countr
     State('country-variable', 'value'),
     State('violence-variable', 'value')
 )
-def update_wcf_chart(_, selected_year, selected_region, selected_country, selected_violence):
-    if selected_year and selected_region and selected_country and selected_violence:
-        dff_wcf = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['country'].isin(selected_country)) & (df['type_of_violence'].isin(selected_violence))]
-    elif selected_year and selected_region and selected_country:
-        dff_wcf = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['country'].isin(selected_country))]
-    elif selected_year and selected_region and selected_violence:
-        dff_wcf = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['type_of_violence'].isin(selected_violence))]
-    elif selected_year and selected_region:
-        dff_wcf = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region))]
-    elif selected_year and selected_violence:
-        dff_wcf = df[(df['year'].isin(selected_year)) & (df['type_of_violence'].isin(selected_violence))]
-    elif selected_region and selected_country:
-        dff_wcf = df[(df['region'].isin(selected_region)) & (df['country'].isin(selected_country))]
-    elif selected_region and selected_violence:
-        dff_wcf = df[(df['region'].isin(selected_region)) & (df['type_of_violence'].isin(selected_violence))]
-    elif selected_year:
-        dff_wcf = df[(df['year'].isin(selected_year))]
-    elif selected_region:
-        dff_wcf = df[(df['region'].isin(selected_region))]
-    elif selected_country:
-        dff_wcf = df[(df['country'].isin(selected_country))]
-    elif selected_violence:
-        dff_wcf = df[(df['type_of_violence'].isin(selected_violence))]
-    else:
-        dff_wcf = df
-    wcf = dff_wcf.groupby(['region', 'country']).agg(
-        conflicts=pd.NamedAgg(column='id', aggfunc='count'),
-        total_fatalities=pd.NamedAgg(column='best', aggfunc='sum')
-        ).reset_index()
+@cached_figure('wcf-chart')
+def update_wcf_chart(_, selected_year, selected_region, selected_country, selected_violence, ds=None):
+    wcf = select_cells(selected_year, selected_region, selected_country, selected_violence, ds).aggregate('region_country', region_country_totals)
     if wcf['conflicts'].sum() == 0:
         fig_wcf = go.Figure()
         fig_wcf.add_annotation(
@@ -1024,41 +1440,32 @@ def update_wcf_chart(_, selected_year, selected_region, selected_country, select
         fig_wcf.update_traces(marker=dict(cornerradius=5))
     return fig_wcf
 
-# TYPE OF VIOLENCE DISTRIBUTION PIE CHART
+# FATALITIES CAUSATION CHARTS
 @app.callback(
     Output('tov-chart', 'figure'),
+    Output('fc-chart', 'figure'),
+    Output('ft-chart', 'figure'),
     Input('submit-btn-fo', 'n_clicks'),
     State('year-variable', 'value'),
     State('region-variable', 'value'),
     State('country-variable', 'value'),
     State('violence-variable', 'value')
 )
-def update_tov_chart(_, selected_year, selected_region, selected_country, selected_violence):
-    if selected_year and selected_region and selected_country and selected_violence:
-        dff_tov = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['country'].isin(selected_country)) & (df['type_of_violence'].isin(selected_violence))]
-    elif selected_year and selected_region and selected_country:
-        dff_tov = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['country'].isin(selected_country))]
-    elif selected_year and selected_region and selected_violence:
-        dff_tov = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['type_of_violence'].isin(selected_violence))]
-    elif selected_year and selected_region:
-        dff_tov = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region))]
-    elif selected_year and selected_violence:
-        dff_tov = df[(df['year'].isin(selected_year)) & (df['type_of_violence'].isin(selected_violence))]
-    elif selected_region and selected_country:
-        dff_tov = df[(df['region'].isin(selected_region)) & (df['country'].isin(selected_country))]
-    elif selected_region and selected_violence:
-        dff_tov = df[(df['region'].isin(selected_region)) & (df['type_of_violence'].isin(selected_violence))]
-    elif selected_year:
-        dff_tov = df[(df['year'].isin(selected_year))]
-    elif selected_region:
-        dff_tov = df[(df['region'].isin(selected_region))]
-    elif selected_country:
-        dff_tov = df[(df['country'].isin(selected_country))]
-    elif selected_violence:
-        dff_tov = df[(df['type_of_violence'].isin(selected_violence))]
-    else:
-        dff_tov = df
-    if dff_tov.empty:
+def update_fo_charts(n_clicks, selected_year, selected_region, selected_country, selected_violence):
+    # filter once, then build the three figures side by side from the same version
+    ds = dataset.current()
+    select_cells(selected_year, selected_region, selected_country, selected_violence, ds)
+    futures = [
+        figure_pool.submit(build, n_clicks, selected_year, selected_region, selected_country, selected_violence, ds=ds)
+        for build in (build_tov_chart, build_fc_chart, build_ft_chart)
+    ]
+    return tuple(future.result() for future in futures)
+
+# TYPE OF VIOLENCE DISTRIBUTION PIE CHART
+@cached_figure('tov-chart')
+def build_tov_chart(_, selected_year, selected_region, selected_country, selected_violence, ds=None):
+    tov = select_cells(selected_year, selected_region, selected_country, selected_violence, ds).aggregate('violence', violence_totals)
+    if tov.empty:
         fig_tov = go.Figure()
         fig_tov.add_annotation(
             text="No data to display",
@@ -1068,7 +1475,7 @@ def update_tov_chart(_, selected_year, selected_region, selected_country, select
         )
     else:
         fig_tov = px.pie(
-            dff_tov,
+            tov,
             names='type_of_violence',
             values='best',
             color='type_of_violence',
@@ -1092,39 +1499,9 @@ def update_tov_chart(_, selected_year, selected_region, selected_country, select
     return fig_tov
 
 # TOP 10 COUNTRIES BASED ON FATALITIES COUNT BAR CHART
-@app.callback(
-    Output('fc-chart', 'figure'),
-    Input('submit-btn-fo', 'n_clicks'),
-    State('year-variable', 'value'),
-    State('region-variable', 'value'),
-    State('country-variable', 'value'),
-    State('violence-variable', 'value')
-)
-def update_fc_chart(_, selected_year, selected_region, selected_country, selected_violence):
-    if selected_year and selected_region and selected_country and selected_violence:
-        dff_fc = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['country'].isin(selected_country)) & (df['type_of_violence'].isin(selected_violence))]
-    elif selected_year and selected_region and selected_country:
-        dff_fc = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['country'].isin(selected_country))]
-    elif selected_year and selected_region and selected_violence:
-        dff_fc = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['type_of_violence'].isin(selected_violence))]
-    elif selected_year and selected_region:
-        dff_fc = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region))]
-    elif selected_year and selected_violence:
-        dff_fc = df[(df['year'].isin(selected_year)) & (df['type_of_violence'].isin(selected_violence))]
-    elif selected_region and selected_country:
-        dff_fc = df[(df['region'].isin(selected_region)) & (df['country'].isin(selected_country))]
-    elif selected_region and selected_violence:
-        dff_fc = df[(df['region'].isin(selected_region)) & (df['type_of_violence'].isin(selected_violence))]
-    elif selected_year:
-        dff_fc = df[(df['year'].isin(selected_year))]
-    elif selected_region:
-        dff_fc = df[(df['region'].isin(selected_region))]
-    elif selected_country:
-        dff_fc = df[(df['country'].isin(selected_country))]
-    elif selected_violence:
-        dff_fc = df[(df['type_of_violence'].isin(selected_violence))]
-    else:
-        dff_fc = df
+@cached_figure('fc-chart')
+def build_fc_chart(_, selected_year, selected_region, selected_country, selected_violence, ds=None):
+    dff_fc = select_cells(selected_year, selected_region, selected_country, selected_violence, ds).subset
     if dff_fc.empty:
         fig_fc = go.Figure()
         fig_fc.add_annotation(
@@ -1134,7 +1511,7 @@ def update_fc_chart(_, selected_year, selected_region, selected_country, selecte
             font=dict(size=20)
         )
     else:
-        bar_data = dff_fc.groupby(['type_of_violence', 'region', 'country'])['best'].sum().reset_index()
+        bar_data = dff_fc.groupby(['type_of_violence', 'region', 'country'], observed=True)['best'].sum().reset_index()
         top_10_countries = bar_data.sort_values(by='best', ascending=False).head(10)
         fig_fc = px.bar(
             top_10_countries,
@@ -1159,40 +1536,10 @@ def update_fc_chart(_, selected_year, selected_region, selected_country, selecte
     return fig_fc
 
 # FATALITIES THRESHOLD DONUT CHARTS
-@app.callback(
-    Output('ft-chart', 'figure'),
-    Input('submit-btn-fo', 'n_clicks'),
-    State('year-variable', 'value'),
-    State('region-variable', 'value'),
-    State('country-variable', 'value'),
-    State('violence-variable', 'value')
-)
-def update_ft_chart(_, selected_year, selected_region, selected_country, selected_violence):
-    if selected_year and selected_region and selected_country and selected_violence:
-        dff_ft = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['country'].isin(selected_country)) & (df['type_of_violence'].isin(selected_violence))]
-    elif selected_year and selected_region and selected_country:
-        dff_ft = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['country'].isin(selected_country))]
-    elif selected_year and selected_region and selected_violence:
-        dff_ft = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['type_of_violence'].isin(selected_violence))]
-    elif selected_year and selected_region:
-        dff_ft = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region))]
-    elif selected_year and selected_violence:
-        dff_ft = df[(df['year'].isin(selected_year)) & (df['type_of_violence'].isin(selected_violence))]
-    elif selected_region and selected_country:
-        dff_ft = df[(df['region'].isin(selected_region)) & (df['country'].isin(selected_country))]
-    elif selected_region and selected_violence:
-        dff_ft = df[(df['region'].isin(selected_region)) & (df['type_of_violence'].isin(selected_violence))]
-    elif selected_year:
-        dff_ft = df[(df['year'].isin(selected_year))]
-    elif selected_region:
-        dff_ft = df[(df['region'].isin(selected_region))]
-    elif selected_country:
-        dff_ft = df[(df['country'].isin(selected_country))]
-    elif selected_violence:
-        dff_ft = df[(df['type_of_violence'].isin(selected_violence))]
-    else:
-        dff_ft = df 
-    if dff_ft.empty:
+@cached_figure('ft-chart')
+def build_ft_chart(_, selected_year, selected_region, selected_country, selected_violence, ds=None):
+    ft = select_cells(selected_year, selected_region, selected_country, selected_violence, ds).aggregate('threshold', threshold_totals)
+    if ft.empty:
         fig_ft = go.Figure()
         fig_ft.add_annotation(
             text="No data to display",
@@ -1209,15 +1556,15 @@ def update_ft_chart(_, selected_year, selected_region, selected_country, selecte
         )
         fig_ft.add_trace(
             go.Pie(
-                labels=dff_ft['region'][dff_ft['active_year'] == "Over 25 fatalities"], 
-                values=dff_ft['best'][dff_ft['active_year'] == "Over 25 fatalities"], 
+                labels=ft['region'][ft['active_year'] == "Over 25 fatalities"], 
+                values=ft['best'][ft['active_year'] == "Over 25 fatalities"], 
                 name=">25"
             ), row=1, col=1
         )
         fig_ft.add_trace(
             go.Pie(
-                labels=dff_ft['region'][dff_ft['active_year'] == "Under 25 fatalities"], 
-                values=dff_ft['best'][dff_ft['active_year'] == "Under 25 fatalities"], 
+                labels=ft['region'][ft['active_year'] == "Under 25 fatalities"], 
+                values=ft['best'][ft['active_year'] == "Under 25 fatalities"], 
                 name="<25"
             ), row=1, col=2
         )
@@ -1241,40 +1588,10 @@ def update_ft_chart(_, selected_year, selected_region, selected_country, selecte
     State('country-variable', 'value'),
     State('violence-variable', 'value')
 )
-def update_tof_chart(_, selected_year, selected_region, selected_country, selected_violence):
-    if selected_year and selected_region and selected_country and selected_violence:
-        dff_tof = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['country'].isin(selected_country)) & (df['type_of_violence'].isin(selected_violence))]
-    elif selected_year and selected_region and selected_country:
-        dff_tof = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['country'].isin(selected_country))]
-    elif selected_year and selected_region and selected_violence:
-        dff_tof = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region)) & (df['type_of_violence'].isin(selected_violence))]
-    elif selected_year and selected_region:
-        dff_tof = df[(df['year'].isin(selected_year)) & (df['region'].isin(selected_region))]
-    elif selected_year and selected_violence:
-        dff_tof = df[(df['year'].isin(selected_year)) & (df['type_of_violence'].isin(selected_violence))]
-    elif selected_region and selected_country:
-        dff_tof = df[(df['region'].isin(selected_region)) & (df['country'].isin(selected_country))]
-    elif selected_region and selected_violence:
-        dff_tof = df[(df['region'].isin(selected_region)) & (df['type_of_violence'].isin(selected_violence))]
-    elif selected_year:
-        dff_tof = df[(df['year'].isin(selected_year))]
-    elif selected_region:
-        dff_tof = df[(df['region'].isin(selected_region))]
-    elif selected_country:
-        dff_tof = df[(df['country'].isin(selected_country))]
-    elif selected_violence:
-        dff_tof = df[(df['type_of_violence'].isin(selected_violence))]
-    else:
-        dff_tof = df
-    tof = dff_tof.groupby(['region', 'country']).agg(
-        conflicts=pd.NamedAgg(column='id', aggfunc='count'),
-        side_a_fatalities=pd.NamedAgg(column='deaths_a', aggfunc='sum'),
-        side_b_fatalities=pd.NamedAgg(column='deaths_b', aggfunc='sum'),
-        civilians_fatalities=pd.NamedAgg(column='deaths_civilians', aggfunc='sum'),
-        unknown_fatalities=pd.NamedAgg(column='deaths_unknown', aggfunc='sum'),
-        total_fatalities=pd.NamedAgg(column='best', aggfunc='sum')
-        ).reset_index()
-    if dff_tof.empty:
+@cached_figure('tof-chart')
+def update_tof_chart(_, selected_year, selected_region, selected_country, selected_violence, ds=None):
+    tof = select_cells(selected_year, selected_region, selected_country, selected_violence, ds).aggregate('region_country', region_country_totals)
+    if tof.empty:
         fig_tof = go.Figure()
         fig_tof.add_annotation(
             text="No data to display",
@@ -1283,18 +1600,24 @@ def update_tof_chart(_, selected_year, selected_region, selected_country, select
             font=dict(size=20)
         )
     else:
-        fig_tof = make_subplots(
-            rows=4, 
-            cols=2, 
-            column_widths=[0.3, 0.7], 
-            subplot_titles=['Conflicts by region', 'First-party fatalities', 'Second-party fatalities', 'Civilian fatalities', 'Unknown fatalities'],
-            specs=[
-                [{"type": "domain", "rowspan": 4}, {"type": "xy"}],
-                [None, {"type": "xy"}],
-                [None, {"type": "xy"}],
-                [None, {"type": "xy"}]
-                ]
-        )
+        with metrics.timed("nlargest"):
+            top_10_side_a = tof.nlargest(10, 'side_a_fatalities')
+            top_10_side_b = tof.nlargest(10, 'side_b_fatalities')
+            top_10_civilians = tof.nlargest(10, 'civilians_fatalities')
+            top_10_unknown = tof.nlargest(10, 'unknown_fatalities')
+        with metrics.timed("make_subplots"):
+            fig_tof = make_subplots(
+                rows=4, 
+                cols=2, 
+                column_widths=[0.3, 0.7], 
+                subplot_titles=['Conflicts by region', 'First-party fatalities', 'Second-party fatalities', 'Civilian fatalities', 'Unknown fatalities'],
+                specs=[
+                    [{"type": "domain", "rowspan": 4}, {"type": "xy"}],
+                    [None, {"type": "xy"}],
+                    [None, {"type": "xy"}],
+                    [None, {"type": "xy"}]
+                    ]
+            )
         fig_tof.add_trace(
             go.Pie(
                 labels=tof['region'], 
@@ -1305,7 +1628,6 @@ def update_tof_chart(_, selected_year, selected_region, selected_country, select
                 showlegend=False
             ), row=1, col=1
         )
-        top_10_side_a = tof.nlargest(10, 'side_a_fatalities')
         fig_tof.add_bar(
             x=top_10_side_a['country'], 
             y=top_10_side_a['side_a_fatalities'], 
@@ -1320,7 +1642,6 @@ def update_tof_chart(_, selected_year, selected_region, selected_country, select
             row=1, 
             col=2
         )
-        top_10_side_b = tof.nlargest(10, 'side_b_fatalities')
         fig_tof.add_bar(
             x=top_10_side_b['country'], 
             y=top_10_side_b['side_b_fatalities'], 
@@ -1335,7 +1656,6 @@ def update_tof_chart(_, selected_year, selected_region, selected_country, select
             row=2, 
             col=2
         )
-        top_10_civilians = tof.nlargest(10, 'civilians_fatalities')
         fig_tof.add_bar(
             x=top_10_civilians['country'], 
             y=top_10_civilians['civilians_fatalities'], 
@@ -1350,7 +1670,6 @@ def update_tof_chart(_, selected_year, selected_region, selected_country, select
             row=3, 
             col=2
         )
-        top_10_unknown = tof.nlargest(10, 'unknown_fatalities')
         fig_tof.add_bar(
             x=top_10_unknown['country'], 
             y=top_10_unknown['unknown_fatalities'], 
@@ -1368,5 +1687,156 @@ def update_tof_chart(_, selected_year, selected_region, selected_country, select
         fig_tof.update_layout(height=1000)
     return fig_tof
 
+# FATALITIES OVER TIME LINE CHART
+TS_FREQUENCIES = {'day': 'D', 'month': 'MS', 'year': 'YS'}
+
+def ts_range(relayout):
+    # visible date range after the user zoomed the x axis, None when autoranged
+    relayout = relayout or {}
+    if 'xaxis.range[0]' in relayout:
+        bounds = relayout['xaxis.range[0]'], relayout['xaxis.range[1]']
+    elif 'xaxis.range' in relayout:
+        bounds = relayout['xaxis.range']
+    else:
+        return None
+    return pd.Timestamp(bounds[0]).floor('D'), pd.Timestamp(bounds[1]).ceil('D')
+
+def ts_figure(ds, selection, resolution, bounds):
+    with metrics.timed("rollup"):
+        series = ds.rollups[resolution].series(selection, *(bounds or (None, None)))
+    fig_ts = go.Figure()
+    if series.empty:
+        fig_ts.add_annotation(
+            text="No data to display",
+            xref="paper", yref="paper",
+            showarrow=False,
+            font=dict(size=20)
+        )
+    downsampled = False
+    for violence, color in [
+        ('State-based conflict', px.colors.qualitative.Dark2[6]),
+        ('Non-state conflict', px.colors.qualitative.Dark2[1]),
+        ('One-sided violence', px.colors.qualitative.Dark2[2])
+    ]:
+        line = series[series['type_of_violence'] == violence]
+        if line.empty:
+            continue
+        dates, values = fill_gaps(line['date'].to_numpy(), line['best'].to_numpy(), TS_FREQUENCIES[resolution])
+        with metrics.timed("downsample"):
+            kept = lttb(dates.view(np.int64), values)
+        downsampled |= len(kept) < len(dates)
+        fig_ts.add_trace(
+            go.Scatter(
+                x=dates[kept],
+                y=values[kept],
+                mode='lines',
+                name=violence,
+                line=dict(color=color, width=1.5)
+            )
+        )
+    fig_ts.update_layout(
+        title_text="Fatalities by violence" + (" (largest-triangle downsampled to %d points per line, zoom in for detail)" % MAX_POINTS if downsampled else ""),
+        yaxis_title="Fatalities",
+        hovermode='x unified',
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='center', x=0.5),
+        # keep the user's zoom when the figure is replaced
+        uirevision='ts-chart'
+    )
+    return fig_ts
+
+@app.callback(
+    Output('ts-chart', 'figure'),
+    Input('submit-btn-ts', 'n_clicks'),
+    Input('ts-resolution', 'value'),
+    Input('ts-chart', 'relayoutData'),
+    State('year-variable', 'value'),
+    State('region-variable', 'value'),
+    State('country-variable', 'value'),
+    State('violence-variable', 'value')
+)
+def update_ts_chart(_, resolution, relayout, selected_year, selected_region, selected_country, selected_violence):
+    # served from the calendar rollups; a zoom re-queries the visible range so
+    # every response stays within MAX_POINTS per line
+    ds = dataset.current()
+    selection = normalize_selection(selected_year, selected_region, selected_country, selected_violence)
+    bounds = ts_range(relayout)
+    key = ('ts-chart', selection, resolution, bounds and (bounds[0].isoformat(), bounds[1].isoformat()), ds.version)
+    return figure_cache.get_or_build(key, lambda: ts_figure(ds, selection, resolution, bounds))
+
+# CONFLICTS MAP
+MAP_VIEW = {'center': {'lat': 15, 'lon': 20}, 'zoom': 1}
+
+def map_view(relayout):
+    # zoom and (west, south, east, north) of what the map currently shows
+    relayout = relayout or {}
+    zoom = relayout.get('map.zoom', MAP_VIEW['zoom'])
+    corners = (relayout.get('map._derived') or {}).get('coordinates')
+    if corners:
+        lons, lats = [c[0] for c in corners], [c[1] for c in corners]
+        return zoom, (min(lons), min(lats), max(lons), max(lats))
+    # no corners reported: estimate them for the 1420 x 700 px graph
+    center = relayout.get('map.center', MAP_VIEW['center'])
+    half_lon = 360 * 1420 / 512 / 2**zoom / 2
+    half_lat = min(half_lon * 700 / 1420, 90)
+    return zoom, (center['lon'] - half_lon, center['lat'] - half_lat, center['lon'] + half_lon, center['lat'] + half_lat)
+
+def map_figure(ds, selection, zoom, bounds):
+    with metrics.timed("binning"):
+        level, cells = ds.pyramid.view(dict(zip(FILTER_DIMENSIONS, selection)), zoom, bounds)
+    fig_cm = go.Figure()
+    if cells.empty:
+        fig_cm.add_annotation(
+            text="No data to display",
+            xref="paper", yref="paper",
+            showarrow=False,
+            font=dict(size=20)
+        )
+    else:
+        fig_cm.add_trace(
+            go.Scattermap(
+                lat=cells['lat'],
+                lon=cells['lon'],
+                mode='markers',
+                marker=dict(
+                    size=4 + 26 * np.sqrt(cells['best'] / max(cells['best'].max(), 1)),
+                    color=np.log10(cells['best'] + 1),
+                    colorscale='Reds',
+                    cmin=0,
+                    opacity=0.7,
+                    colorbar=dict(title='Fatalities', tickvals=[0, 1, 2, 3, 4, 5], ticktext=['0', '10', '100', '1k', '10k', '100k'])
+                ),
+                customdata=cells[['events', 'best']].to_numpy(),
+                hovertemplate='Conflicts: %{customdata[0]}<br>Fatalities: %{customdata[1]}<extra></extra>'
+            )
+        )
+    fig_cm.update_layout(
+        map=dict(style='carto-positron', **MAP_VIEW),
+        margin=dict(l=0, r=0, t=30, b=0),
+        title_text="%d cells of %g° (zoom in for finer cells)" % (len(cells), 180 / 2**level),
+        # keep the user's pan and zoom when the figure is replaced
+        uirevision='cm-chart'
+    )
+    return fig_cm
+
+@app.callback(
+    Output('cm-chart', 'figure'),
+    Input('submit-btn-cm', 'n_clicks'),
+    Input('cm-chart', 'relayoutData'),
+    State('year-variable', 'value'),
+    State('region-variable', 'value'),
+    State('country-variable', 'value'),
+    State('violence-variable', 'value')
+)
+def update_cm_chart(_, relayout, selected_year, selected_region, selected_country, selected_violence):
+    # each view is binned on the server, so the browser never gets more than
+    # GED_MAP_MAX_CELLS markers; the figure cache key is the grid cells in view
+    ds = dataset.current()
+    selection = normalize_selection(selected_year, selected_region, selected_country, selected_violence)
+    zoom, bounds = map_view(relayout)
+    level = level_for_zoom(zoom)
+    key = ('cm-chart', selection, level, ds.pyramid.cell_range(level, bounds), ds.version)
+    return figure_cache.get_or_build(key, lambda: map_figure(ds, selection, zoom, bounds))
+
 if __name__ == '__main__':
+    dataset.start_polling()
     app.run_server(debug=True)
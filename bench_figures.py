@@ -0,0 +1,76 @@
+import argparse
+import json
+import logging
+import time
+
+import orjson
+import plotly.io as pio
+from plotly.io.json import to_json_plotly
+
+# Serves every chart for a set of selections the way a callback response does,
+# through the previous path (pio.to_json, json.loads) and the current one
+# (cache.figure_json, orjson.loads), both followed by Dash's own encoding of the
+# response. Checks both decode to the same figure and reports payload bytes and
+# time per chart for a cache miss (encode, decode, respond) and a cache hit
+# (decode, respond):
+#   python bench_figures.py --repeat 20
+
+SELECTIONS = [
+    [[], [], [], []],
+    [[2010], [], [], []],
+    [[2000, 2001, 2002], [], [], []],
+    [[], ['Africa'], [], []],
+    [[], [], [], ['One-sided violence']]
+]
+
+
+def timed_encode(encode, fig, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        payload = encode(fig)
+    return payload, (time.perf_counter() - t0) / repeat
+
+
+def respond(figure):
+    # what Dash does with a callback's return value
+    return to_json_plotly({'multi': True, 'response': {'chart': {'figure': figure}}})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    import app
+    from cache import figure_json
+    paths = {
+        'old': (lambda f: pio.to_json(f, validate=False), json.loads),
+        'new': (figure_json, orjson.loads)
+    }
+    charts = {
+        'wcf-chart': app.update_wcf_chart,
+        'tov-chart': app.build_tov_chart,
+        'fc-chart': app.build_fc_chart,
+        'ft-chart': app.build_ft_chart,
+        'tof-chart': app.update_tof_chart
+    }
+    print('%-10s %10s %10s %10s %10s %8s %10s %10s %8s' % (
+        'chart', 'old B', 'new B', 'old miss', 'new miss', 'speedup', 'old hit', 'new hit', 'speedup'))
+    for name, callback in charts.items():
+        totals = {path: {'bytes': 0, 'miss': 0, 'hit': 0} for path in paths}
+        decoded = {}
+        for selection in SELECTIONS:
+            fig = callback.__wrapped__(1, *selection)
+            for path, (encode, decode) in paths.items():
+                payload, encode_s = timed_encode(encode, fig, args.repeat)
+                response, hit_s = timed_encode(lambda p: respond(decode(p)), payload, args.repeat)
+                totals[path]['bytes'] += len(response)
+                totals[path]['miss'] += encode_s + hit_s
+                totals[path]['hit'] += hit_s
+                decoded[path] = json.loads(response)
+            assert decoded['old'] == decoded['new'], (name, selection)
+        n = len(SELECTIONS)
+        old, new = totals['old'], totals['new']
+        print('%-10s %10d %10d %10.2f %10.2f %7.1fx %10.2f %10.2f %7.1fx' % (
+            name, old['bytes'] / n, new['bytes'] / n, old['miss'] / n * 1e3, new['miss'] / n * 1e3,
+            old['miss'] / new['miss'], old['hit'] / n * 1e3, new['hit'] / n * 1e3, old['hit'] / new['hit']))
@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import orjson
+import pandas as pd
+import plotly.io as pio
+from _plotly_utils.utils import PlotlyJSONEncoder
+
+from metrics import timed
+
+# figure_json reads plotly internals (typed-array helpers, Figure._data/_layout);
+# a plotly without them is served through pio.to_json instead
+try:
+    from _plotly_utils.utils import is_skipped_key, to_typed_array_spec
+except ImportError:
+    is_skipped_key = to_typed_array_spec = None
+
+_plotly_default = PlotlyJSONEncoder().default
+# serialized templates; every figure carries its full template but the app only
+# ever uses one or two, so each is encoded once
+_templates = []
+
+
+def _typed_arrays(obj):
+    # what Figure.to_dict() does, without deep-copying the figure first: numeric
+    # arrays become plotly.js typed-array specs (dtype + base64 "bdata")
+    if isinstance(obj, dict):
+        return {k: v if is_skipped_key(k) else _typed_arrays(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_typed_arrays(v) for v in obj]
+    if isinstance(obj, (np.ndarray, pd.Series, pd.Index)):
+        return to_typed_array_spec(obj)
+    return obj
+
+
+def _default(obj):
+    # whatever orjson can't encode natively: string/object arrays, then plotly's rules
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return _plotly_default(obj)
+
+
+def _dumps(obj):
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def _template_json(template):
+    for known, payload in _templates:
+        if known is template or known == template:
+            return payload
+    payload = _dumps(_typed_arrays(template))
+    if len(_templates) < 8:
+        _templates.append((template, payload))
+    return payload
+
+
+def _fast_path(fig):
+    return to_typed_array_spec is not None and all(hasattr(fig, a) for a in ('_data', '_layout', '_frame_objs'))
+
+
+def figure_json(fig):
+    # same document as pio.to_json(fig), built from the figure's own dicts
+    if not _fast_path(fig):
+        return pio.to_json(fig, validate=False).encode()
+    layout = dict(fig._layout)
+    template = layout.pop('template', None)
+    layout_json = _dumps(_typed_arrays(layout))
+    if template is not None:
+        layout_json = layout_json[:-1] + (b',' if len(layout_json) > 2 else b'') + b'"template":' + _template_json(template) + b'}'
+    parts = [b'{"data":', _dumps(_typed_arrays(fig._data)), b',"layout":', layout_json]
+    frames = [frame._props for frame in fig._frame_objs]
+    if frames:
+        parts += [b',"frames":', _dumps(_typed_arrays(frames))]
+    parts.append(b'}')
+    return b''.join(parts)
+
+
+class FigureCache:
+    # serialized figure JSON (bytes) keyed by (figure id, selection, dataset version),
+    # bounded by total bytes with LRU eviction and a per-entry TTL
+
+    def __init__(self, max_bytes=64 * 2**20, ttl=600):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _drop(self, key):
+        _, payload = self._entries.pop(key)
+        self.bytes -= len(payload)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, payload):
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, payload)
+            self.bytes += len(payload)
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_build(self, key, build):
+        payload = self.get(key)
+        if payload is None:
+            figure = build()
+            with timed("serialize"):
+                payload = figure_json(figure)
+            self.put(key, payload)
+        with timed("deserialize"):
+            return orjson.loads(payload)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
@@ -0,0 +1,270 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import urllib.request
+
+import pandas as pd
+import pyarrow as pa
+
+from profiling import phase
+
+logger = logging.getLogger(__name__)
+
+REMOTE_SOURCE = "https://raw.githubusercontent.com/jmanali1996/Civilian-Conflicts/main/GEDEvent_v24_1.csv"
+LOCAL_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "GEDEvent_v24_1.csv")
+CACHE_DIR = os.environ.get("GED_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+# GED_MMAP=1: back the event table with a memory-mapped Arrow IPC file, so every
+# process on the host reads the same page-cache copy instead of a private one
+USE_MMAP = os.environ.get("GED_MMAP") == "1"
+
+
+def _local_copy(path):
+    # a checkout without git-lfs has only the pointer file, not the CSV
+    try:
+        with open(path, "rb") as f:
+            return not f.read(64).startswith(b"version https://git-lfs")
+    except OSError:
+        return False
+
+
+# the repository's copy of the GED CSV, or the same file on GitHub when it isn't
+# checked out; GED_SOURCE overrides both
+DATA_SOURCE = os.environ.get("GED_SOURCE") or (LOCAL_SOURCE if _local_copy(LOCAL_SOURCE) else REMOTE_SOURCE)
+
+# only the columns the dashboard reads; the rest of the GED file is never parsed
+COLUMNS = [
+    'id', 'year', 'active_year', 'type_of_violence', 'conflict_name', 'region', 'country',
+    'where_prec', 'date_prec', 'date_start', 'date_end', 'latitude', 'longitude',
+    'best', 'deaths_a', 'deaths_b', 'deaths_civilians', 'deaths_unknown'
+]
+
+# GED integer codes and the labels the dashboard shows for them
+VIOLENCE_LABELS = {1: "State-based conflict", 2: "Non-state conflict", 3: "One-sided violence"}
+ACTIVE_YEAR_LABELS = {0: "Under 25 fatalities", 1: "Over 25 fatalities"}
+WHERE_PREC_LABELS = {
+    1: "Exact location",
+    2: "Within 25 km radius",
+    3: "Local area",
+    4: "Region level",
+    5: "Linear feature",
+    6: "Country level",
+    7: "International waters/airspace"
+}
+DATE_PREC_LABELS = {1: "Exact date", 2: "2-6 day range", 3: "Week known", 4: "Month known", 5: "Year known"}
+CODED_COLUMNS = {
+    'type_of_violence': VIOLENCE_LABELS,
+    'active_year': ACTIVE_YEAR_LABELS,
+    'where_prec': WHERE_PREC_LABELS,
+    'date_prec': DATE_PREC_LABELS
+}
+TEXT_DIMENSIONS = ['region', 'country', 'conflict_name']
+
+# bump whenever the snapshot layout changes so stale snapshots get rebuilt
+SNAPSHOT_VERSION = 4
+
+# timings and sizes of the last load_events() call
+LOAD_REPORT = {}
+
+
+def _is_url(source):
+    return source.startswith(("http://", "https://"))
+
+
+def _snapshot_paths(source):
+    name = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(CACHE_DIR, name + ".parquet"), os.path.join(CACHE_DIR, name + ".json")
+
+
+def _ipc_path(source):
+    return os.path.join(CACHE_DIR, os.path.splitext(os.path.basename(source))[0] + ".arrow")
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_replace(path, write):
+    # write(tmp) into a temp file of this process, then rename it over path, so
+    # processes starting together never read or write each other's half files
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _write_meta(path, meta):
+    def write(tmp):
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+    _write_replace(path, write)
+
+
+def _remote_size(url):
+    # HEAD is enough to notice a new release; None means we could not tell
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, method="HEAD"), timeout=10) as resp:
+            length = resp.headers.get("Content-Length")
+            return int(length) if length else None
+    except OSError:
+        return None
+
+
+def _snapshot_is_fresh(source, meta):
+    if meta.get("version") != SNAPSHOT_VERSION or meta.get("columns") != COLUMNS or meta.get("source") != source:
+        return False
+    if _is_url(source):
+        size = _remote_size(source)
+        # offline: trust the snapshot rather than fail to start
+        return size is None or size == meta["size"]
+    if not os.path.exists(source):
+        return True
+    stat = os.stat(source)
+    if stat.st_size != meta["size"]:
+        return False
+    if stat.st_mtime == meta.get("mtime"):
+        return True
+    if _sha256(source) != meta["sha256"]:
+        return False
+    # same content with a new mtime (e.g. a fresh checkout): remember the mtime
+    # so the next start doesn't hash the file again
+    meta["mtime"] = stat.st_mtime
+    _write_meta(_snapshot_paths(source)[1], meta)
+    return True
+
+
+def _fetch(source, workdir):
+    if not _is_url(source):
+        return source
+    path = os.path.join(workdir, os.path.basename(source))
+    with urllib.request.urlopen(source) as resp, open(path, "wb") as f:
+        shutil.copyfileobj(resp, f, 1 << 20)
+    return path
+
+
+def encode_events(events):
+    # integer codes become categoricals whose categories are the labels, so each
+    # row costs one byte and isin/groupby compare codes instead of strings
+    for col, labels in CODED_COLUMNS.items():
+        events[col] = events[col].astype(pd.CategoricalDtype(list(labels))).cat.rename_categories(labels)
+    for col in TEXT_DIMENSIONS:
+        events[col] = events[col].astype('category')
+    events['year'] = events['year'].astype('int16')
+    # ~1 m precision is plenty for the map
+    for col in ['latitude', 'longitude']:
+        events[col] = events[col].astype('float32')
+    # parsed once here so the in-memory table holds no per-row Python strings
+    for col in ['date_start', 'date_end']:
+        events[col] = pd.to_datetime(events[col], format='%Y/%m/%d %H:%M:%S')
+    return events
+
+
+def build_snapshot(source=DATA_SOURCE):
+    parquet_path, meta_path = _snapshot_paths(source)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=CACHE_DIR) as workdir:
+        csv_path = _fetch(source, workdir)
+        with phase("read_csv"):
+            events = pd.read_csv(csv_path, usecols=COLUMNS, low_memory=False)[COLUMNS]
+        with phase("encode"):
+            events = encode_events(events)
+        stat = os.stat(csv_path)
+        meta = {
+            "version": SNAPSHOT_VERSION,
+            "source": source,
+            "columns": COLUMNS,
+            "size": stat.st_size,
+            "mtime": None if _is_url(source) else stat.st_mtime,
+            "sha256": _sha256(csv_path),
+            "rows": len(events)
+        }
+        # write then rename so a crashed build never leaves a half snapshot behind
+        with phase("write_snapshot"):
+            _write_replace(parquet_path, lambda tmp: events.to_parquet(tmp, index=False))
+    _write_meta(meta_path, meta)
+    return events, meta
+
+
+def write_ipc(events, path):
+    # uncompressed so the mapped buffers can be handed to pandas as they are
+    table = pa.Table.from_pandas(events, preserve_index=False)
+
+    def write(tmp):
+        with pa.OSFile(tmp, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    # every process writes its own temp file; the last rename wins and the
+    # files mapped by the others stay intact
+    _write_replace(path, write)
+
+
+def read_ipc(path):
+    # numeric, datetime and categorical-code columns come back as read-only views
+    # of the mapping; split_blocks stops pandas consolidating them into copies
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    return table.to_pandas(split_blocks=True, self_destruct=False)
+
+
+def load_events(source=DATA_SOURCE):
+    parquet_path, meta_path = _snapshot_paths(source)
+    report = {"source": source, "snapshot": parquet_path}
+    t0 = time.perf_counter()
+    meta = None
+    with phase("snapshot_check"):
+        if os.path.exists(parquet_path) and os.path.exists(meta_path):
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                # unreadable meta is a cache miss, never a failed start
+                meta = None
+            if meta is not None and not _snapshot_is_fresh(source, meta):
+                meta = None
+    t1 = time.perf_counter()
+    report["snapshot_hit"] = meta is not None
+    events = None
+    if meta is None:
+        events, meta = build_snapshot(source)
+    if USE_MMAP:
+        ipc_path = report["mmap"] = _ipc_path(source)
+        # rebuilt whenever the Parquet snapshot is newer than the mapped file
+        if events is not None or not os.path.exists(ipc_path) or os.path.getmtime(ipc_path) < os.path.getmtime(parquet_path):
+            with phase("write_ipc"):
+                write_ipc(events if events is not None else pd.read_parquet(parquet_path, columns=COLUMNS), ipc_path)
+        with phase("map_ipc"):
+            events = read_ipc(ipc_path)
+    elif events is None:
+        with phase("read_snapshot"):
+            events = pd.read_parquet(parquet_path, columns=COLUMNS)
+    t2 = time.perf_counter()
+    report.update({
+        "sha256": meta["sha256"],
+        "rows": len(events),
+        "columns": len(events.columns),
+        "memory_mb": round(events.memory_usage(deep=True).sum() / 2**20, 1),
+        "check_s": round(t1 - t0, 3),
+        "load_s": round(t2 - t1, 3),
+        "total_s": round(t2 - t0, 3)
+    })
+    LOAD_REPORT.clear()
+    LOAD_REPORT.update(report)
+    logger.info("GED events loaded: %s", json.dumps(report))
+    return events
+
+
+if __name__ == '__main__':
+    # python data.py twice: the first run builds the snapshot, the second shows the warm start
+    logging.basicConfig(level=logging.INFO)
+    load_events()
+    print(json.dumps(LOAD_REPORT, indent=2))
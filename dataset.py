@@ -0,0 +1,266 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from functools import cached_property, lru_cache
+
+import numpy as np
+import pandas as pd
+
+from data import CACHE_DIR, COLUMNS, TEXT_DIMENSIONS, encode_events
+from geo import GridPyramid
+from profiling import phase
+from timeseries import build_rollups
+from query import (
+    CUBE_DIMENSIONS, CUBE_MEASURES, FilterIndex, HierarchyIndex, SelectionCache,
+    build_cube, grid_filter_mask, grid_sort
+)
+
+logger = logging.getLogger(__name__)
+
+# GED_CANDIDATES_DIR: drop UCDP candidate event CSVs here; every process picks them
+# up in file-name order, replacing events whose id it already has. Only *.csv and
+# *.parquet names are read, so write a batch under another name and rename it
+# GED_CANDIDATES_POLL: seconds between directory checks (negative disables)
+CANDIDATES_DIR = os.environ.get("GED_CANDIDATES_DIR", os.path.join(CACHE_DIR, "candidates"))
+CANDIDATES_POLL = float(os.environ.get("GED_CANDIDATES_POLL", 60))
+
+DETAILS_COLUMNS = ['year', 'region', 'country', 'conflict_name', 'where_prec', 'date_prec', 'best']
+
+
+def conflict_period(events):
+    return (events['date_end'] - events['date_start']).dt.days.to_numpy(np.int32)
+
+
+def details_view(events, period):
+    # the Conflicts Details table (dff_cd): the event table's own column arrays,
+    # not copies, plus the int32 duration; rows stay in event order
+    details = pd.DataFrame({col: events[col] for col in DETAILS_COLUMNS}, copy=False)
+    details['conflict_period'] = period
+    return details
+
+
+def _order_key(period, best):
+    # (conflict_period, best) packed into one int64 that sorts the same way
+    return period.astype(np.int64) * 2**32 + best.astype(np.int64)
+
+
+def details_order(period, best):
+    # default grid order, longest and then deadliest first; ties keep event order
+    return np.argsort(-_order_key(period, best), kind='stable').astype(np.int32)
+
+
+class Dataset:
+    # one immutable version of the events and everything derived from them;
+    # ingestion builds a new Dataset and swaps it in, so a request that took a
+    # reference keeps reading a consistent version until it finishes
+
+    def __init__(self, events, version, period, order, cube, batches=()):
+        self.events = events
+        self.version = version
+        self.period = period
+        self.order = order
+        self.details = details_view(events, period)
+        self.cube = cube
+        self.batches = batches
+        with phase("filter_index"):
+            self.cube_index = FilterIndex(cube)
+        with phase("hierarchy_index"):
+            self.hierarchy = HierarchyIndex(cube)
+        self.selections = SelectionCache(cube, self.cube_index)
+        # per version, so results of an older version are never served
+        self.grid_rows = lru_cache(maxsize=32)(self._grid_rows)
+
+    @classmethod
+    def build(cls, events, version):
+        with phase("dff_cd_period"):
+            period = conflict_period(events)
+        with phase("dff_cd_order"):
+            order = details_order(period, events['best'].to_numpy())
+        with phase("cube"):
+            cube = build_cube(events)
+        return cls(events, version, period, order, cube)
+
+    @cached_property
+    def dropdown_options(self):
+        return {
+            dim: [{'label': v, 'value': v} for v in sorted(self.cube[dim].unique().tolist())]
+            for dim in ['year', 'region', 'country', 'type_of_violence']
+        }
+
+    @cached_property
+    def hierarchy_data(self):
+        return self.hierarchy.compact()
+
+    # event-level filter index for the export; built on first use
+    @cached_property
+    def event_index(self):
+        with phase("event_filter_index"):
+            return FilterIndex(self.events)
+
+    # the map's per-level cells; built on first map visit
+    @cached_property
+    def pyramid(self):
+        with phase("grid_pyramid"):
+            return GridPyramid(self.events)
+
+    @cached_property
+    def rollups(self):
+        with phase("calendar_rollups"):
+            return build_rollups(self.events)
+
+    def _grid_rows(self, filter_key, sort_key):
+        # matching rows in the default order, then stably sorted by the grid's model
+        mask = grid_filter_mask(self.details, json.loads(filter_key))
+        return grid_sort(self.details, self.order[mask[self.order]], json.loads(sort_key))
+
+
+def _unify_categories(frames, columns):
+    # concat and groupby only keep categoricals whose categories are identical
+    for col in columns:
+        categories = frames[0][col].cat.categories
+        for frame in frames[1:]:
+            categories = categories.union(frame[col].cat.categories)
+        for frame in frames:
+            if not frame[col].cat.categories.equals(categories):
+                frame[col] = frame[col].cat.set_categories(categories)
+
+
+def _merge_cube(cube, added, removed):
+    # cells are sums, so replacing events is: subtract their old cells, add the new
+    removed = removed.copy()
+    removed[['conflicts'] + CUBE_MEASURES] *= -1
+    merged = pd.concat([cube, added, removed], ignore_index=True)
+    merged = merged.groupby(CUBE_DIMENSIONS, observed=True).sum().reset_index()
+    return merged[merged['conflicts'] > 0].reset_index(drop=True)
+
+
+def ingest(dataset, batch, stamp):
+    # appends an encoded batch of events; rows whose id is already loaded are
+    # replaced. Only the batch and the replaced rows are aggregated, the rest of
+    # the derived state is carried over from the current version. The new event
+    # table is private to this process: it no longer shares the pages of a
+    # preloaded or memory-mapped table with the other workers
+    name = stamp[0]
+    batch = batch.drop_duplicates('id', keep='last').reset_index(drop=True)
+    events = dataset.events
+    replaced = events['id'].isin(batch['id']).to_numpy()
+    old = events[replaced]
+    kept = events[~replaced]
+    _unify_categories([kept, batch, old], TEXT_DIMENSIONS)
+    with phase("ingest_events"):
+        merged = pd.concat([kept, batch], ignore_index=True)
+    with phase("ingest_cube"):
+        cube = dataset.cube.copy()
+        _unify_categories([cube, batch], ['region', 'country'])
+        cube = _merge_cube(cube, build_cube(batch), build_cube(old))
+    with phase("ingest_dff_cd"):
+        period = np.concatenate([dataset.period[~replaced], conflict_period(batch)])
+        # kept rows keep their order under their new positions; the sorted batch
+        # is merged in behind equal keys, as a full stable sort would place it
+        kept_order = (np.cumsum(~replaced) - 1)[dataset.order[~replaced[dataset.order]]]
+        key = _order_key(period, merged['best'].to_numpy())
+        added = len(kept) + np.argsort(-key[len(kept):], kind='stable')
+        order = np.insert(kept_order, np.searchsorted(-key[kept_order], -key[added], side='right'), added).astype(np.int32)
+    digest = hashlib.sha256(dataset.version.encode())
+    digest.update(name.encode())
+    digest.update(pd.util.hash_pandas_object(batch, index=False).to_numpy().tobytes())
+    logger.info("ingested %s: %d events, %d replaced", name, len(batch), int(replaced.sum()))
+    return Dataset(merged, digest.hexdigest()[:16], period, order, cube, dataset.batches + (stamp,))
+
+
+def read_batch(path):
+    if path.endswith(".parquet"):
+        batch = pd.read_parquet(path, columns=COLUMNS)
+    else:
+        batch = pd.read_csv(path, usecols=COLUMNS, low_memory=False)[COLUMNS]
+    batch = encode_events(batch)
+    # conflict_period needs both dates; NaT would cast to a garbage duration
+    if batch[['date_start', 'date_end']].isna().any(axis=None):
+        raise ValueError("%s: events without date_start or date_end" % path)
+    return batch
+
+
+def _stamp(path, name):
+    # a batch is known by name, size and mtime, so a file that is rewritten or was
+    # still being copied when it was read gets read again
+    stat = os.stat(path)
+    return name, stat.st_size, stat.st_mtime_ns
+
+
+_current = None
+_swap_lock = threading.Lock()
+_poller_lock = threading.Lock()
+_poller_pid = None
+_unreadable = set()
+
+
+def init(events, version):
+    global _current
+    _current = Dataset.build(events, version)
+    refresh()
+    return _current
+
+
+def current():
+    return _current
+
+
+def start_polling():
+    # starts this process's candidate poller. Call it after forking (gunicorn's
+    # post_fork hook, see gunicorn.conf.py): a thread started in a preloading
+    # master would ingest there, and a worker forked while it held _swap_lock
+    # would inherit the lock taken and never ingest
+    global _poller_pid
+    if CANDIDATES_POLL < 0:
+        return
+    with _poller_lock:
+        if _poller_pid == os.getpid():
+            return
+        _poller_pid = os.getpid()
+    threading.Thread(target=_poll, name="candidates", daemon=True).start()
+
+
+def _poll():
+    while True:
+        time.sleep(max(CANDIDATES_POLL, 1))
+        try:
+            refresh()
+        except Exception:
+            logger.exception("candidate ingestion failed")
+
+
+def refresh():
+    # one thread ingests while the others keep serving the current version
+    global _current
+    if not _swap_lock.acquire(blocking=False):
+        return _current
+    try:
+        # a worker that isn't preloaded may poll before the app has loaded
+        if _current is None or not os.path.isdir(CANDIDATES_DIR):
+            return _current
+        names = sorted(n for n in os.listdir(CANDIDATES_DIR) if n.endswith((".csv", ".parquet")))
+        dataset = _current
+        for name in names:
+            path = os.path.join(CANDIDATES_DIR, name)
+            try:
+                stamp = _stamp(path, name)
+            except OSError:
+                continue
+            if stamp in dataset.batches or stamp in _unreadable:
+                continue
+            try:
+                batch = read_batch(path)
+                dataset = ingest(dataset, batch, stamp)
+            except Exception:
+                # a bad batch is skipped until the file changes; the batches
+                # before and after it still go in
+                logger.exception("skipping candidate batch %s", name)
+                _unreadable.add(stamp)
+                continue
+            _current = dataset
+        return _current
+    finally:
+        _swap_lock.release()
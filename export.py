@@ -0,0 +1,61 @@
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# rows per chunk; one chunk of events is the most an export holds at a time.
+# pandas' CSV writer needs ~0.6 KB per row while it works, Parquet far less, and
+# bigger row groups compress better
+CHUNK_ROWS = int(os.environ.get("GED_EXPORT_CHUNK_ROWS", 10000))
+ROW_GROUP_ROWS = 5 * CHUNK_ROWS
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+
+
+class _ChunkSink:
+    # write-only file for pyarrow that hands back what was written since the last drain
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def csv_chunks(events, rows, chunk_rows=CHUNK_ROWS):
+    for start in range(0, max(len(rows), 1), chunk_rows):
+        chunk = events.take(rows[start:start + chunk_rows])
+        yield chunk.to_csv(index=False, header=start == 0).encode()
+
+
+def parquet_chunks(events, rows, chunk_rows=ROW_GROUP_ROWS):
+    # one row group per chunk, streamed as soon as it is written; the footer
+    # goes out last
+    sink = _ChunkSink()
+    schema = pa.Schema.from_pandas(events, preserve_index=False)
+    with pq.ParquetWriter(sink, schema) as writer:
+        for start in range(0, len(rows), chunk_rows):
+            chunk = events.take(rows[start:start + chunk_rows])
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+    yield sink.drain()
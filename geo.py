@@ -0,0 +1,134 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from query import FILTER_DIMENSIONS, FilterIndex
+
+# equal-angle quadtree: level z splits longitude into 2**(z+1) and latitude into
+# 2**z cells, so a cell's parent at the next coarser level is a bit shift away
+MAX_LEVEL = 11
+# upper bound on the cells one map response may carry
+MAX_CELLS = int(os.environ.get("GED_MAP_MAX_CELLS", 4000))
+
+
+def level_for_zoom(zoom):
+    # a cell spans roughly 10-20 px at the map's zoom level
+    return min(MAX_LEVEL, max(0, int(math.floor(zoom)) + 3))
+
+
+def _cell_size(level):
+    return 180.0 / 2**level
+
+
+def _merge(starts, x, y, events, best, lat, lon):
+    # sums the rows of every (filter cell, grid cell); rows come sorted by filter
+    # cell, and so do the merged ones
+    keys = (np.repeat(np.arange(len(starts) - 1, dtype=np.int64), np.diff(starts)) << 32) \
+        | (x.astype(np.int64) << 16) | y
+    keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    count = np.bincount(inverse, weights=events)
+    return {
+        'starts': np.searchsorted(keys >> 32, np.arange(len(starts)), side='left'),
+        'x': x[first],
+        'y': y[first],
+        'events': count.astype(np.int32),
+        'best': np.bincount(inverse, weights=best).astype(np.int64),
+        # event-weighted centres; float32 is ~1 m, as for the event coordinates
+        'lat': (np.bincount(inverse, weights=lat * events) / count).astype(np.float32),
+        'lon': (np.bincount(inverse, weights=lon * events) / count).astype(np.float32)
+    }
+
+
+class GridPyramid:
+    # events, fatalities and centre per (filter cell, grid cell) at every level,
+    # like the cube but per map cell. A level's rows are grouped by filter cell,
+    # so a selection reads the rows of its filter cells and never the events
+
+    def __init__(self, events):
+        lat = events['latitude'].to_numpy(np.float64)
+        lon = events['longitude'].to_numpy(np.float64)
+        valid = np.isfinite(lat) & np.isfinite(lon)
+        dims = events[FILTER_DIMENSIONS][valid]
+        # filter cell of every event, then the events ordered by it
+        group = dims.groupby(FILTER_DIMENSIONS, observed=True, sort=False).ngroup().to_numpy()
+        order = np.argsort(group, kind='stable')
+        first = order[np.r_[0, np.flatnonzero(np.diff(group[order])) + 1]] if len(order) else order
+        self.groups = dims.iloc[first].reset_index(drop=True)
+        self.group_index = FilterIndex(self.groups)
+        size = _cell_size(MAX_LEVEL)
+        lat, lon = lat[valid][order], lon[valid][order]
+        x = np.clip((lon + 180) // size, 0, 2**(MAX_LEVEL + 1) - 1).astype(np.uint16)
+        y = np.clip((lat + 90) // size, 0, 2**MAX_LEVEL - 1).astype(np.uint16)
+        starts = np.searchsorted(group[order], np.arange(len(first) + 1))
+        best = events['best'].to_numpy()[valid][order]
+        level = self.finest = _merge(starts, x, y, np.ones(len(x)), best, lat, lon)
+        # a level is only kept while it has at most half the finest level's rows;
+        # the finer ones are shifted from the finest level per request, which
+        # reads no more than twice the rows a kept table would
+        self.levels = [None] * MAX_LEVEL + [level]
+        for z in range(MAX_LEVEL - 1, -1, -1):
+            level = _merge(level['starts'], level['x'] >> 1, level['y'] >> 1, level['events'],
+                           level['best'], level['lat'].astype(np.float64), level['lon'].astype(np.float64))
+            if 2 * len(level['x']) <= len(self.finest['x']):
+                self.levels[z] = level
+
+    def cell_range(self, level, bounds):
+        # (west, south, east, north) in degrees -> inclusive cell index range;
+        # x0 > x1 when the view crosses the antimeridian
+        west, south, east, north = bounds
+        size = _cell_size(level)
+        columns = 2**(level + 1)
+        if east - west >= 360:
+            x0, x1 = 0, columns - 1
+        else:
+            x0 = int(((west + 180) % 360) // size)
+            x1 = int(((east + 180) % 360) // size)
+        y0 = int(min(max((south + 90) // size, 0), 2**level - 1))
+        y1 = int(min(max((north + 90) // size, 0), 2**level - 1))
+        return x0, x1, y0, y1
+
+    def _table(self, level):
+        # (rows, bit shift to the level's cells)
+        if self.levels[level] is not None:
+            return self.levels[level], 0
+        return self.finest, MAX_LEVEL - level
+
+    def _rows(self, table, groups):
+        # positions of the selected filter cells' rows in a table
+        starts = table['starts']
+        if groups is None:
+            return np.arange(starts[-1])
+        begin, length = starts[groups], starts[groups + 1] - starts[groups]
+        return np.repeat(begin - np.cumsum(length) + length, length) + np.arange(length.sum())
+
+    def cells(self, groups, level, cell_range):
+        # events, fatalities and event-weighted centre of every non-empty cell
+        table, shift = self._table(level)
+        rows = self._rows(table, groups)
+        x, y = table['x'][rows] >> shift, table['y'][rows] >> shift
+        x0, x1, y0, y1 = cell_range
+        inside = (x >= x0) & (x <= x1) if x0 <= x1 else (x >= x0) | (x <= x1)
+        inside &= (y >= y0) & (y <= y1)
+        rows = rows[inside]
+        keys = (x[inside].astype(np.int32) << 16) | y[inside]
+        _, cell = np.unique(keys, return_inverse=True)
+        events = np.bincount(cell, weights=table['events'][rows])
+        return pd.DataFrame({
+            'lat': np.bincount(cell, weights=table['lat'][rows] * table['events'][rows]) / events,
+            'lon': np.bincount(cell, weights=table['lon'][rows] * table['events'][rows]) / events,
+            'events': events.astype(np.int64),
+            'best': np.bincount(cell, weights=table['best'][rows]).astype(np.int64)
+        })
+
+    def view(self, selection, zoom, bounds):
+        # finest level at or below the zoom's that fits MAX_CELLS in the view
+        selected = {dim: values for dim, values in selection.items() if values}
+        groups = self.group_index.select(selected) if selected else None
+        level = level_for_zoom(zoom)
+        while True:
+            cells = self.cells(groups, level, self.cell_range(level, bounds))
+            if len(cells) <= MAX_CELLS or level == 0:
+                return level, cells
+            level -= 1
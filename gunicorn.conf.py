@@ -0,0 +1,16 @@
+import os
+
+bind = os.environ.get("GED_BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+threads = int(os.environ.get("GED_THREADS", 4))
+# load the dataset once in the master and fork workers from it, so the event
+# table, cube and indexes are shared copy-on-write instead of loaded per worker
+preload_app = os.environ.get("GED_PRELOAD", "1") == "1"
+timeout = 120
+
+
+def post_fork(server, worker):
+    # each worker polls the candidates folder with its own thread; the master,
+    # which only forks, never ingests
+    import dataset
+    dataset.start_polling()
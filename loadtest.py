@@ -0,0 +1,226 @@
+import argparse
+import http.client
+import json
+import logging
+import random
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+
+import numpy as np
+
+# Replays analyst sessions against /_dash-update-component and reports throughput
+# and latency percentiles per callback:
+#   python loadtest.py --users 1,4,16 --duration 30             (in-process Flask test client)
+#   python loadtest.py --url http://127.0.0.1:8050 --users 8    (running server, e.g. gunicorn)
+
+FILTERS = ['year-variable', 'region-variable', 'country-variable', 'violence-variable']
+PAGES = {
+    'wcf': '/worldwide-conflicts-and-fatalities',
+    'fo': '/fatalities-causation',
+    'fd': '/fatalities-distribution',
+    'cd': '/conflicts-details'
+}
+# (callback name, outputs, submit button) for the pages driven by a submit button
+SUBMITS = {
+    'wcf': [
+        ('wcf-cards', ['selected-year-card.children', 'selected-region-card.children', 'selected-country-card.children',
+                       'conflict-count-card.children', 'fatality-sum-card.children'], 'submit-btn-wcf'),
+        ('wcf-chart', ['wcf-chart.figure'], 'submit-btn-wcf')
+    ],
+    'fo': [('fo-charts', ['tov-chart.figure', 'fc-chart.figure', 'ft-chart.figure'], 'submit-btn-fo')],
+    'fd': [('tof-chart', ['tof-chart.figure'], 'submit-btn-fd')]
+}
+CD_BLOCK = 120
+CD_TEXT_FILTERS = {'region': ['Africa', 'Asia', 'Europe'], 'country': ['an', 'ia', 'Syria'], 'conflict_name': ['Government', 'IS', 'civilians']}
+CD_SORTS = ['conflict_period', 'best', 'year', 'country']
+
+
+def _payload(outputs, inputs, state=()):
+    outs = [{'id': o.split('.')[0], 'property': o.split('.')[1]} for o in outputs]
+    return {
+        'output': '..' + '...'.join(outputs) + '..' if len(outputs) > 1 else outputs[0],
+        'outputs': outs if len(outs) > 1 else outs[0],
+        'inputs': [{'id': i, 'property': p, 'value': v} for i, p, v in inputs],
+        'state': [{'id': i, 'property': p, 'value': v} for i, p, v in state],
+        'changedPropIds': ['%s.%s' % (inputs[0][0], inputs[0][1])]
+    }
+
+
+class TestClientTransport:
+    # the app imported in this process; one Flask test client per user thread
+
+    def __init__(self):
+        logging.disable(logging.INFO)
+        import app
+        self.server = app.server
+
+    def session(self):
+        client = self.server.test_client()
+
+        def post(body):
+            resp = client.post('/_dash-update-component', json=body)
+            return resp.status_code, resp.data
+        return post
+
+
+class HttpTransport:
+    # a running server; one keep-alive connection per user thread
+
+    def __init__(self, url):
+        parts = urllib.parse.urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+
+    def session(self):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=120)
+
+        def post(body):
+            conn.request('POST', self.prefix + '/_dash-update-component', json.dumps(body),
+                         {'Content-Type': 'application/json'})
+            resp = conn.getresponse()
+            return resp.status, resp.read()
+        return post
+
+
+def _find_options(node, found):
+    # dropdown options as served by the page layout callback
+    if isinstance(node, dict):
+        props = node.get('props', node)
+        if props.get('id') in FILTERS and 'options' in props:
+            found[props['id']] = [o['value'] for o in props['options']]
+        for value in node.values():
+            _find_options(value, found)
+    elif isinstance(node, list):
+        for value in node:
+            _find_options(value, found)
+    return found
+
+
+class Recorder:
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.bytes = defaultdict(int)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def call(self, post, name, body):
+        t0 = time.perf_counter()
+        try:
+            status, data = post(body)
+        except (OSError, http.client.HTTPException):
+            status, data = None, b''
+        seconds = time.perf_counter() - t0
+        with self._lock:
+            if status in (200, 204):
+                self.samples[name].append(seconds)
+                self.bytes[name] += len(data)
+            else:
+                self.errors[name] += 1
+        return data if status == 200 else None
+
+    def report(self, elapsed):
+        rows = {}
+        for name in sorted(set(self.samples) | set(self.errors)):
+            ms = np.array(self.samples[name]) * 1e3
+            rows[name] = {
+                'requests': len(ms),
+                'errors': self.errors[name],
+                'rps': round(len(ms) / elapsed, 2),
+                'p50_ms': round(float(np.percentile(ms, 50)), 1) if len(ms) else None,
+                'p95_ms': round(float(np.percentile(ms, 95)), 1) if len(ms) else None,
+                'p99_ms': round(float(np.percentile(ms, 99)), 1) if len(ms) else None,
+                'mean_kb': round(self.bytes[name] / len(ms) / 1024, 1) if len(ms) else None
+            }
+        return rows
+
+
+def random_selection(rng, options):
+    # mostly a year or two, sometimes narrowed to a region, country or violence type
+    return [
+        rng.sample(options['year-variable'], rng.choice([0, 1, 1, 2, 3])),
+        rng.sample(options['region-variable'], rng.choice([0, 0, 0, 1, 2])),
+        rng.sample(options['country-variable'], rng.choice([0, 0, 0, 0, 1])),
+        rng.sample(options['violence-variable'], rng.choice([0, 0, 1]))
+    ]
+
+
+def run_page(page, post, recorder, rng, submits):
+    data = recorder.call(post, 'page-' + page, _payload(['page-content.children'], [('url', 'pathname', PAGES[page])]))
+    if data is None:
+        return
+    if page == 'cd':
+        run_grid(post, recorder, rng, submits)
+        return
+    options = _find_options(json.loads(data), {})
+    for n_clicks in range(1, submits + 1):
+        selection = random_selection(rng, options)
+        state = [(f, 'value', v or None) for f, v in zip(FILTERS, selection)]
+        for name, outputs, button in SUBMITS[page]:
+            recorder.call(post, name, _payload(outputs, [(button, 'n_clicks', n_clicks)], state))
+
+
+def run_grid(post, recorder, rng, scrolls):
+    # first block, then a filter or a sort change followed by a few blocks of scrolling
+    filter_model, sort_model = {}, []
+    for step in range(scrolls):
+        if step and rng.random() < 0.3:
+            col = rng.choice(list(CD_TEXT_FILTERS))
+            filter_model = {col: {'filterType': 'text', 'type': 'contains', 'filter': rng.choice(CD_TEXT_FILTERS[col])}}
+        if step and rng.random() < 0.3:
+            sort_model = [{'colId': rng.choice(CD_SORTS), 'sort': rng.choice(['asc', 'desc'])}]
+        for block in range(rng.randint(1, 4)):
+            request = {'startRow': block * CD_BLOCK, 'endRow': (block + 1) * CD_BLOCK,
+                       'filterModel': filter_model, 'sortModel': sort_model}
+            recorder.call(post, 'cd-rows', _payload(['conflicts-details.getRowsResponse'],
+                                                    [('conflicts-details', 'getRowsRequest', request)]))
+
+
+def run(transport, users, duration, pages, submits, seed):
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+
+    def user(n):
+        rng = random.Random(seed + n)
+        post = transport.session()
+        while time.monotonic() < deadline:
+            run_page(rng.choice(pages), post, recorder, rng, submits)
+
+    threads = [threading.Thread(target=user, args=(n,), daemon=True) for n in range(users)]
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.report(time.perf_counter() - t0)
+
+
+def print_report(users, rows):
+    print('\n%d concurrent users' % users)
+    print('%-12s %8s %6s %8s %9s %9s %9s %9s' % ('callback', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'mean KB'))
+    for name, row in rows.items():
+        print('%-12s %8d %6d %8.2f %9s %9s %9s %9s' % (
+            name, row['requests'], row['errors'], row['rps'], row['p50_ms'], row['p95_ms'], row['p99_ms'], row['mean_kb']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='base URL of a running server (default: in-process Flask test client)')
+    parser.add_argument('--users', default='1,4,16', help='comma separated concurrency levels to run one after another')
+    parser.add_argument('--duration', type=float, default=30, help='seconds per concurrency level')
+    parser.add_argument('--pages', default='wcf,fo,fd,cd', help='comma separated subset of ' + ','.join(PAGES))
+    parser.add_argument('--submits', type=int, default=5, help='submits (or grid scroll steps) per page visit')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+    transport = HttpTransport(args.url) if args.url else TestClientTransport()
+    pages = args.pages.split(',')
+    results = {}
+    for users in [int(u) for u in args.users.split(',')]:
+        results[users] = run(transport, users, args.duration, pages, args.submits, args.seed)
+        print_report(users, results[users])
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,140 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+# GED_METRICS=0: record nothing and don't serve /metrics
+ENABLED = os.environ.get("GED_METRICS", "1") != "0"
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = tuple(2**k for k in range(10, 26, 2))
+
+# callback the current thread is working for; phases are labelled with it
+_callback = contextvars.ContextVar("callback", default="none")
+
+
+class Histogram:
+    # cumulative-bucket histogram per label tuple, rendered in Prometheus text format
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.help), "# TYPE %s histogram" % self.name]
+        with self._lock:
+            series = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        for labels, (counts, total) in series:
+            pairs = ",".join('%s="%s"' % (k, v) for k, v in zip(self.labels, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append('%s_bucket{%s,le="%s"} %d' % (self.name, pairs, bound, cumulative))
+            lines.append("%s_sum{%s} %.6f" % (self.name, pairs, total))
+            lines.append("%s_count{%s} %d" % (self.name, pairs, cumulative))
+        return lines
+
+
+CALLBACK_SECONDS = Histogram(
+    "ged_callback_seconds", "Time to answer a Dash callback request, serialization included.",
+    ("callback",), SECONDS_BUCKETS)
+CALLBACK_BYTES = Histogram(
+    "ged_callback_payload_bytes", "Size of the Dash callback response body.",
+    ("callback",), BYTES_BUCKETS)
+PHASE_SECONDS = Histogram(
+    "ged_callback_phase_seconds", "Time spent in one phase of a callback.",
+    ("callback", "phase"), SECONDS_BUCKETS)
+HISTOGRAMS = [CALLBACK_SECONDS, CALLBACK_BYTES, PHASE_SECONDS]
+
+# functions returning (name, type, help, value) samples, e.g. cache counters
+_collectors = []
+
+
+@contextmanager
+def callback(name):
+    token = _callback.set(name)
+    try:
+        yield
+    finally:
+        _callback.reset(token)
+
+
+@contextmanager
+def timed(phase):
+    # usable as `with timed(...)` or as a decorator
+    if not ENABLED:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASE_SECONDS.observe((_callback.get(), phase), time.perf_counter() - t0)
+
+
+def collector(collect):
+    _collectors.append(collect)
+    return collect
+
+
+def render():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    for collect in _collectors:
+        for name, kind, help, value in collect():
+            lines.extend(["# HELP %s %s" % (name, help), "# TYPE %s %s" % (name, kind), "%s %s" % (name, value)])
+    return "\n".join(lines) + "\n"
+
+
+def install(app):
+    # times every /_dash-update-component request and labels it with the Python
+    # name of the callback that answered it
+    if not ENABLED:
+        return
+    names = {}
+
+    def callback_name():
+        # only outputs of registered callbacks are remembered, so clients posting
+        # made-up outputs can't grow the dict
+        output = (request.get_json(silent=True) or {}).get("output", "")
+        if output not in names:
+            if output not in app.callback_map:
+                return "unknown"
+            names[output] = getattr(app.callback_map[output].get("callback"), "__name__", "unknown")
+        return names[output]
+
+    @app.server.before_request
+    def start_timer():
+        if request.path.endswith("/_dash-update-component"):
+            g.metrics_name = callback_name()
+            _callback.set(g.metrics_name)
+            g.metrics_start = time.perf_counter()
+
+    @app.server.after_request
+    def stop_timer(response):
+        if "metrics_start" in g:
+            CALLBACK_SECONDS.observe((g.metrics_name,), time.perf_counter() - g.metrics_start)
+            CALLBACK_BYTES.observe((g.metrics_name,), response.calculate_content_length() or 0)
+            _callback.set("none")
+        return response
+
+    @app.server.route("/metrics")
+    def serve_metrics():
+        return Response(render(), mimetype="text/plain; version=0.0.4")
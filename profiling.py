@@ -0,0 +1,73 @@
+import json
+import logging
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# GED_PROFILE_PATH: where the startup report is written ("" disables the file)
+# GED_PROFILE_TRACEMALLOC=1: also record Python allocation peaks per phase (slow)
+PROFILE_PATH = os.environ.get("GED_PROFILE_PATH")
+TRACE_ALLOCATIONS = os.environ.get("GED_PROFILE_TRACEMALLOC") == "1"
+
+# rss: "current" from procfs, or "peak" where only ru_maxrss is available
+STARTUP_REPORT = {"started": time.time(), "rss": "current", "phases": []}
+# phases after write_report() (lazy builds, ingestion) are only logged
+_recording = True
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        # no procfs: peak RSS is the best we have, so rss_delta_mb is the growth
+        # of the peak there; ru_maxrss is bytes on macOS and KB elsewhere
+        STARTUP_REPORT["rss"] = "peak"
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+@contextmanager
+def phase(name):
+    # usable as `with phase(...)` or as a decorator
+    if TRACE_ALLOCATIONS:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+    rss = _rss_mb()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - t0
+        rss_after = _rss_mb()
+        record = {
+            "phase": name,
+            "seconds": round(seconds, 4),
+            "rss_mb": round(rss_after, 1),
+            "rss_delta_mb": round(rss_after - rss, 1)
+        }
+        if TRACE_ALLOCATIONS:
+            record["alloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        if _recording:
+            STARTUP_REPORT["phases"].append(record)
+        logger.info("phase %s", json.dumps(record))
+
+
+def write_report(default_path, **extra):
+    global _recording
+    _recording = False
+    STARTUP_REPORT.update(extra)
+    STARTUP_REPORT["total_seconds"] = round(sum(p["seconds"] for p in STARTUP_REPORT["phases"]), 4)
+    logger.info("startup report %s", json.dumps(STARTUP_REPORT))
+    path = default_path if PROFILE_PATH is None else PROFILE_PATH
+    if path:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(STARTUP_REPORT, f, indent=2)
+    return STARTUP_REPORT
@@ -0,0 +1,214 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+FILTER_DIMENSIONS = ['year', 'region', 'country', 'type_of_violence']
+CUBE_DIMENSIONS = FILTER_DIMENSIONS + ['active_year']
+CUBE_MEASURES = ['best', 'deaths_a', 'deaths_b', 'deaths_civilians', 'deaths_unknown']
+
+
+def build_cube(events):
+    # one row per observed (year, region, country, type_of_violence, active_year);
+    # every chart and card is an aggregate of these cells, never of event rows
+    return events.groupby(CUBE_DIMENSIONS, observed=True).agg(
+        conflicts=pd.NamedAgg(column='id', aggfunc='count'),
+        **{m: pd.NamedAgg(column=m, aggfunc='sum') for m in CUBE_MEASURES}
+        ).reset_index()
+
+
+class FilterIndex:
+    # one packed bitmap per (dimension, value); a selection ORs the bitmaps of the
+    # chosen values inside a dimension and ANDs the dimensions together
+
+    def __init__(self, frame, dimensions=FILTER_DIMENSIONS):
+        self.size = len(frame)
+        self.bitmaps = {}
+        for dim in dimensions:
+            codes, values = pd.factorize(frame[dim])
+            self.bitmaps[dim] = {value: np.packbits(codes == k) for k, value in enumerate(values)}
+        self._empty = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def mask(self, selection):
+        bits = None
+        for dim, values in selection.items():
+            if not values:
+                continue
+            index = self.bitmaps[dim]
+            dim_bits = self._empty.copy()
+            for value in values:
+                if value in index:
+                    np.bitwise_or(dim_bits, index[value], out=dim_bits)
+            bits = dim_bits if bits is None else np.bitwise_and(bits, dim_bits, out=bits)
+        return bits
+
+    def select(self, selection):
+        # positional row index of the rows matching the selection
+        bits = self.mask(selection)
+        if bits is None:
+            return np.arange(self.size)
+        return np.flatnonzero(np.unpackbits(bits, count=self.size))
+
+
+def normalize_selection(selected_year, selected_region, selected_country, selected_violence):
+    # dropdown order and repeats don't change the result, so they must not change the key
+    return tuple(
+        tuple(sorted(set(values))) if values else ()
+        for values in (selected_year, selected_region, selected_country, selected_violence)
+    )
+
+
+class Selection:
+    # filtered row index of one query plus the aggregates callbacks derived from it
+
+    def __init__(self, frame, rows):
+        self.frame = frame
+        self.rows = rows
+        self._aggregates = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    @property
+    def subset(self):
+        if len(self.rows) == len(self.frame):
+            return self.frame
+        return self.frame.take(self.rows)
+
+    def aggregate(self, name, compute):
+        # callbacks of one submit arrive together; a lock per aggregate makes the
+        # first caller compute it and the others wait for its result, while
+        # different aggregates of the same selection still compute in parallel
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._aggregates:
+                self._aggregates[name] = compute(self.subset)
+            return self._aggregates[name]
+
+
+class SelectionCache:
+    # bounded LRU of Selections keyed by normalize_selection()
+
+    def __init__(self, frame, index, maxsize=64):
+        self.frame = frame
+        self.index = index
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            rows = self.index.select(dict(zip(FILTER_DIMENSIONS, key))).astype(np.int32)
+            selection = self._entries[key] = Selection(self.frame, rows)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return selection
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+# AG Grid filter types, applied server-side for the infinite row model
+TEXT_FILTERS = {
+    'contains': lambda s, v: s.str.contains(v, case=False, regex=False),
+    'notContains': lambda s, v: ~s.str.contains(v, case=False, regex=False),
+    'equals': lambda s, v: s.str.lower() == v.lower(),
+    'notEqual': lambda s, v: s.str.lower() != v.lower(),
+    'startsWith': lambda s, v: s.str.lower().str.startswith(v.lower()),
+    'endsWith': lambda s, v: s.str.lower().str.endswith(v.lower())
+}
+NUMBER_FILTERS = {
+    'equals': lambda s, v, to: s == v,
+    'notEqual': lambda s, v, to: s != v,
+    'lessThan': lambda s, v, to: s < v,
+    'lessThanOrEqual': lambda s, v, to: s <= v,
+    'greaterThan': lambda s, v, to: s > v,
+    'greaterThanOrEqual': lambda s, v, to: s >= v,
+    'inRange': lambda s, v, to: (s > v) & (s < to)
+}
+
+
+def _condition_mask(column, model):
+    if 'operator' in model:
+        conditions = model.get('conditions') or [model['condition1'], model['condition2']]
+        masks = [_condition_mask(column, condition) for condition in conditions]
+        combine = np.logical_and if model['operator'] == 'AND' else np.logical_or
+        return combine.reduce(masks)
+    kind = model.get('type')
+    if kind == 'blank':
+        return column.isna().to_numpy()
+    if kind == 'notBlank':
+        return column.notna().to_numpy()
+    if model.get('filterType') == 'number':
+        return NUMBER_FILTERS[kind](column, model.get('filter'), model.get('filterTo')).to_numpy()
+    value = str(model.get('filter', ''))
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # match the handful of distinct labels, then select rows by code
+        categories = column.cat.categories.astype(str).to_series()
+        return column.cat.codes.isin(np.flatnonzero(TEXT_FILTERS[kind](categories, value))).to_numpy()
+    return TEXT_FILTERS[kind](column.astype(str), value).fillna(False).to_numpy()
+
+
+def grid_filter_mask(frame, filter_model):
+    mask = np.ones(len(frame), dtype=bool)
+    for col, model in filter_model.items():
+        if col in frame.columns:
+            mask &= _condition_mask(frame[col], model)
+    return mask
+
+
+def grid_sort(frame, rows, sort_model):
+    # stable lexsort of the filtered rows, so ties keep the order `rows` came in;
+    # categoricals sort by code
+    keys = []
+    for sort in reversed(sort_model):
+        if sort['colId'] not in frame.columns:
+            continue
+        column = frame[sort['colId']]
+        values = column.cat.codes.to_numpy() if isinstance(column.dtype, pd.CategoricalDtype) else column.to_numpy()
+        values = values[rows].astype(np.float64)
+        keys.append(-values if sort['sort'] == 'desc' else values)
+    if not keys:
+        return rows
+    return rows[np.lexsort(keys)]
+
+
+class HierarchyIndex:
+    # year -> region -> countries membership, built once from the cube
+
+    def __init__(self, cube):
+        self.tree = {}
+        pairs = cube[['year', 'region', 'country']].drop_duplicates()
+        for year, region, country in pairs.itertuples(index=False):
+            self.tree.setdefault(int(year), {}).setdefault(region, set()).add(country)
+        self.all_regions = {}
+        for regions in self.tree.values():
+            for region, countries in regions.items():
+                self.all_regions.setdefault(region, set()).update(countries)
+
+    def compact(self):
+        # JSON for the browser: labels once, then index lists per year and region
+        regions = sorted(self.all_regions)
+        countries = sorted(set().union(*self.all_regions.values()))
+        region_ids = {region: i for i, region in enumerate(regions)}
+        country_ids = {country: i for i, country in enumerate(countries)}
+        return {
+            'regions': regions,
+            'countries': countries,
+            'years': {
+                str(year): [
+                    [region_ids[region], sorted(country_ids[c] for c in branch[region])]
+                    for region in sorted(branch)
+                ]
+                for year, branch in sorted(self.tree.items())
+            }
+        }
@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REGIONS = ['Africa', 'Americas', 'Asia', 'Europe', 'Middle East']
+
+
+def synthetic_events(rows, seed=0):
+    # raw GED columns, coded the way the UCDP CSV codes them
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('1989-01-01') + pd.to_timedelta(rng.integers(0, 35 * 365, rows), unit='D')
+    region = rng.choice(REGIONS, rows)
+    country = np.char.add(np.char.add(region.astype(str), ' country '), rng.integers(0, 20, rows).astype(str))
+    deaths = rng.integers(0, 40, (rows, 4))
+    return pd.DataFrame({
+        'id': np.arange(1, rows + 1),
+        'year': start.year,
+        'active_year': rng.integers(0, 2, rows),
+        'type_of_violence': rng.integers(1, 4, rows),
+        'conflict_name': np.char.add('conflict ', rng.integers(0, 300, rows).astype(str)),
+        'region': region,
+        'country': country,
+        'where_prec': rng.integers(1, 8, rows),
+        'date_prec': rng.integers(1, 6, rows),
+        'date_start': start.strftime('%Y/%m/%d %H:%M:%S'),
+        'date_end': (start + pd.to_timedelta(rng.integers(0, 30, rows), unit='D')).strftime('%Y/%m/%d %H:%M:%S'),
+        'latitude': rng.uniform(-60, 70, rows),
+        'longitude': rng.uniform(-180, 180, rows),
+        'best': deaths.sum(axis=1),
+        'deaths_a': deaths[:, 0],
+        'deaths_b': deaths[:, 1],
+        'deaths_civilians': deaths[:, 2],
+        'deaths_unknown': deaths[:, 3]
+    })
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp('ged')
+    source = workdir / 'GEDEvent_test.csv'
+    synthetic_events(20000).to_csv(source, index=False)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('GED_SOURCE', str(source))
+        mp.setenv('GED_CACHE_DIR', str(workdir / 'cache'))
+        mp.setenv('GED_PROFILE_PATH', '')
+        mp.setenv('GED_CANDIDATES_POLL', '-1')
+        mp.syspath_prepend(ROOT)
+        import app
+    return app
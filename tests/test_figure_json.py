@@ -0,0 +1,29 @@
+import json
+
+import orjson
+import plotly.io as pio
+import pytest
+
+SELECTIONS = {
+    'unfiltered': ([], [], [], []),
+    'year': ([2010], [], [], []),
+    'region': ([], ['Africa'], [], []),
+    'violence': ([], [], [], ['One-sided violence'])
+}
+CHARTS = ['update_wcf_chart', 'build_tov_chart', 'build_fc_chart', 'build_ft_chart', 'update_tof_chart']
+
+
+@pytest.fixture(params=[True, False], ids=['fast', 'fallback'])
+def figure_json(request, monkeypatch, app):
+    # the orjson encoder, and the pio.to_json path a plotly without its internals takes
+    import cache
+    if not request.param:
+        monkeypatch.setattr(cache, 'to_typed_array_spec', None)
+    return cache.figure_json
+
+
+@pytest.mark.parametrize('chart', CHARTS)
+@pytest.mark.parametrize('selection', SELECTIONS.values(), ids=SELECTIONS.keys())
+def test_figure_json_matches_to_json(app, figure_json, chart, selection):
+    fig = getattr(app, chart).__wrapped__(1, *selection)
+    assert orjson.loads(figure_json(fig)) == json.loads(pio.to_json(fig, validate=False))
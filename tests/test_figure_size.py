@@ -0,0 +1,58 @@
+import base64
+
+import numpy as np
+import orjson
+import pandas as pd
+import pytest
+
+from conftest import REGIONS
+
+# the pies must not grow with the events behind them
+MAX_FIGURE_BYTES = 16 * 2**10
+
+
+@pytest.fixture(scope='module')
+def datasets(app):
+    # the same events, and five times as many
+    import dataset
+    ds = dataset.current()
+    events = pd.concat([ds.events] * 5, ignore_index=True)
+    return [ds, dataset.Dataset.build(events, ds.version + '-x5')]
+
+
+SELECTIONS = {
+    'unfiltered': ([], [], [], []),
+    'filtered': ([2010, 2011], ['Asia', 'Africa'], [], ['State-based conflict'])
+}
+
+
+def slices(trace):
+    # labels are a list, or a plotly.js typed array spec (dtype + base64 bdata)
+    labels = trace.get('labels', [])
+    if isinstance(labels, dict):
+        return len(base64.b64decode(labels['bdata'])) // np.dtype(labels['dtype']).itemsize
+    return len(labels)
+
+
+@pytest.mark.parametrize('selection', SELECTIONS.values(), ids=SELECTIONS.keys())
+def test_tov_chart_is_one_slice_per_violence_type(app, datasets, selection):
+    sizes = []
+    for ds in datasets:
+        figure = app.build_tov_chart(1, *selection, ds=ds)
+        sizes.append(len(orjson.dumps(figure)))
+        assert sum(slices(trace) for trace in figure['data']) <= 3
+    assert max(sizes) < MAX_FIGURE_BYTES
+    assert sizes[1] < sizes[0] * 1.1
+
+
+@pytest.mark.parametrize('selection', SELECTIONS.values(), ids=SELECTIONS.keys())
+def test_ft_chart_is_one_slice_per_region(app, datasets, selection):
+    sizes = []
+    for ds in datasets:
+        figure = app.build_ft_chart(1, *selection, ds=ds)
+        sizes.append(len(orjson.dumps(figure)))
+        assert len(figure['data']) == 2
+        assert all(slices(trace) <= len(REGIONS) for trace in figure['data'])
+    assert max(sizes) < MAX_FIGURE_BYTES
+    assert sizes[1] < sizes[0] * 1.1
+
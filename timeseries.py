@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from query import FILTER_DIMENSIONS, FilterIndex
+
+# points per violence type a series response may carry
+MAX_POINTS = int(os.environ.get("GED_SERIES_POINTS", 1000))
+RESOLUTIONS = ['day', 'month', 'year']
+
+
+class Rollup:
+    # fatalities per filter cell and calendar period, with its own filter index
+
+    def __init__(self, events, period):
+        keys = [events[dim] for dim in FILTER_DIMENSIONS] + [period.rename('date')]
+        self.frame = events['best'].groupby(keys, observed=True).sum().reset_index()
+        self.index = FilterIndex(self.frame)
+
+    def series(self, selection, start=None, end=None):
+        # one row per (type_of_violence, date) with fatalities under the selection
+        frame = self.frame.take(self.index.select(dict(zip(FILTER_DIMENSIONS, selection))))
+        if start is not None:
+            frame = frame[(frame['date'] >= start) & (frame['date'] <= end)]
+        return frame.groupby(['type_of_violence', 'date'], observed=True)['best'].sum().reset_index()
+
+
+def build_rollups(events):
+    day = events['date_start'].dt.floor('D')
+    return {
+        'day': Rollup(events, day),
+        'month': Rollup(events, day.dt.to_period('M').dt.to_timestamp()),
+        'year': Rollup(events, pd.to_datetime(events['year'].astype(str), format='%Y'))
+    }
+
+
+def fill_gaps(dates, values, freq):
+    # a line needs the quiet periods too, or it draws straight over them
+    periods = pd.date_range(dates.min(), dates.max(), freq=freq)
+    return periods.to_numpy(), pd.Series(values, index=dates).reindex(periods, fill_value=0).to_numpy()
+
+
+def lttb(x, y, points=MAX_POINTS):
+    # Largest-Triangle-Three-Buckets: keeps first and last point and, from each
+    # bucket in between, the point spanning the largest triangle with the point
+    # kept before it and the next bucket's mean, so peaks survive downsampling
+    n = len(x)
+    if n <= points or points < 3:
+        return np.arange(n)
+    xs = x.astype(np.float64)
+    ys = y.astype(np.float64)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    kept = np.empty(points, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt = slice(hi, edges[i + 2]) if i + 2 < len(edges) else slice(n - 1, n)
+        cx, cy = xs[nxt].mean(), ys[nxt].mean()
+        area = np.abs((xs[a] - cx) * (ys[lo:hi] - ys[a]) - (xs[a] - xs[lo:hi]) * (cy - ys[a]))
+        a = kept[i + 1] = lo + int(area.argmax())
+    return kept
@@ -0,0 +1,8 @@
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:server
+import gc
+
+from app import server
+
+# everything allocated while loading the data is long-lived; freezing it keeps the
+# garbage collector from writing to those pages in forked workers (copy-on-write)
+gc.freeze()